@@ -19,4 +19,11 @@ class BookingStatus(str, Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
     CANCELLED = "cancelled"
-    COMPLETED = "completed"
\ No newline at end of file
+    COMPLETED = "completed"
+
+
+class UploadSessionStatus(str, Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+    EXPIRED = "expired"
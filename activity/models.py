@@ -3,7 +3,7 @@ from sqlalchemy.orm import relationship
 from datetime import datetime
 
 from ..s3_database import Base
-from .enums import TeamStatus, ActivityType, BookingStatus
+from .enums import TeamStatus, ActivityType, BookingStatus, UploadSessionStatus
 
 # Team members association table
 team_members = Table(
@@ -94,4 +94,31 @@ class ActivityPhoto(Base):
 
     # Relationships
     activity = relationship("Activity", back_populates="photos")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+
+class UploadSession(Base):
+    """Resumable upload of an activity photo; parts live in an S3 multipart upload until completion"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)  # unguessable token
+    activity_id = Column(Integer, ForeignKey("activities.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    file_key = Column(String, nullable=False)  # S3 key of the final file
+    upload_id = Column(String, nullable=False)  # S3 multipart upload id
+    file_name = Column(String)
+    content_type = Column(String, nullable=False)
+    caption = Column(String)
+    total_size = Column(Integer, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    status = Column(String, default=UploadSessionStatus.ACTIVE, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    # Photo created by completing the session
+    photo_id = Column(Integer, ForeignKey("activity_photos.id"), nullable=True)
+
+    # Relationships
+    activity = relationship("Activity")
+    user = relationship("User")
+    photo = relationship("ActivityPhoto")
@@ -1,17 +1,158 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Request, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Request, HTTPException, status
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List, Literal, Optional
+import asyncio
+import math
+import uuid
+from datetime import datetime, timedelta
 
 from ..s3_database import get_db
-from ..utils.s3_service import upload_file_to_s3, delete_file_from_s3
+from ..utils.s3_service import (
+    upload_file_to_s3,
+    generate_presigned_post,
+    head_file_in_s3,
+    read_file_head,
+    create_multipart_upload,
+    upload_part_to_s3,
+    list_uploaded_parts,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    generate_presigned_urls,
+    file_key_from_url,
+    CONTENT_PREFIX,
+    S3_BASE_URL,
+)
+from ..utils.image_derivatives import generate_renditions
+from ..utils.delete_queue import schedule_photo_delete, cancel_photo_delete, resume_pending_deletes
+from ..utils.media_validation import MAX_HEADER_BYTES, MediaLimits, MediaValidationError, check_header
 
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
+# Image types accepted by the photo endpoints
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/gif"]
+
+# Files of one multi-file request uploaded to S3 at the same time
+MAX_CONCURRENT_UPLOADS_PER_REQUEST = 4
+
+# Largest photo accepted by direct-to-S3 uploads
+MAX_PHOTO_SIZE = 10 * 1024 * 1024
+
+# S3 folder of each direct upload target; the id is appended for per-entity targets
+UPLOAD_TARGET_PREFIXES = {
+    "profile-picture": "profile-pictures",
+    "team-photo": "team-photos",
+    "activity-photo": "activity-photos",
+    "venue-photo": "venue-photos",
+}
+
+# Direct uploads not completed this long after their policy expired are deleted
+DIRECT_UPLOAD_GRACE = 3600
+
+# Keys signed by one batch signing request
+MAX_SIGNED_URLS_PER_REQUEST = 200
+
+# What each photo endpoint accepts; checked against the file's real bytes while it is uploaded
+UPLOAD_LIMITS = {
+    "profile-picture": MediaLimits(max_bytes=5 * 1024 * 1024, max_width=4096, max_height=4096,
+                                   max_pixels=16_000_000),
+    "team-photo": MediaLimits(max_bytes=MAX_PHOTO_SIZE),
+    "activity-photo": MediaLimits(max_bytes=MAX_PHOTO_SIZE),
+    "venue-photo": MediaLimits(max_bytes=MAX_PHOTO_SIZE),
+}
+
+# Resumable uploads: large activity media sent in parts, each at least S3's 5 MB minimum
+RESUMABLE_UPLOAD_LIMITS = MediaLimits(max_bytes=64 * 1024 * 1024, max_width=12000, max_height=12000,
+                                      max_pixels=80_000_000)
+RESUMABLE_PART_SIZE = 8 * 1024 * 1024
+RESUMABLE_SESSION_TTL = timedelta(hours=24)
+
+UploadTarget = Literal["profile-picture", "team-photo", "activity-photo", "venue-photo"]
+
+
+async def upload_files_concurrently(
+        files: List[UploadFile],
+        file_prefix: str,
+        metadata: Dict[str, str],
+        limits: MediaLimits,
+        max_concurrency: int = MAX_CONCURRENT_UPLOADS_PER_REQUEST
+) -> List[Dict[str, Any]]:
+    """
+    Upload several files to S3 at once, at most max_concurrency at a time
+
+    A failed file only fails its own result. If the request itself is
+    aborted, the files uploaded so far are queued for deletion.
+
+    Returns:
+        One result per file, in request order: file_name and either url
+        and key, or error
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def upload(file: UploadFile) -> Dict[str, Any]:
+        if file.content_type not in ALLOWED_IMAGE_TYPES:
+            return {"file_name": file.filename, "error": "Only JPEG, PNG, and GIF images are allowed"}
+        async with semaphore:
+            try:
+                upload_result = await upload_file_to_s3(
+                    file_content=file.file,
+                    file_name=file.filename,
+                    content_type=file.content_type,
+                    file_prefix=file_prefix,
+                    metadata=metadata,
+                    limits=limits
+                )
+            except HTTPException as e:
+                return {"file_name": file.filename, "error": e.detail}
+            except Exception as e:
+                print(f"Error uploading {file.filename} to S3: {str(e)}")
+                return {"file_name": file.filename, "error": f"Error uploading file to S3: {str(e)}"}
+        return {
+            "file_name": file.filename,
+            "url": upload_result["url"],
+            "key": upload_result["key"],
+            "deduplicated": upload_result["deduplicated"]
+        }
+
+    tasks = [asyncio.ensure_future(upload(file)) for file in files]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is None and "url" in task.result():
+                await schedule_photo_delete(task.result()["url"])
+        raise
+
+
+async def save_photo_records(db: Session, photos: List[Any], results: List[Dict[str, Any]]):
+    """
+    Insert photo rows in one transaction after their uploads finished
+
+    If the insert fails, the uploaded files are queued for deletion so no
+    unreferenced objects are left in S3.
+    """
+    try:
+        db.add_all(photos)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for result in results:
+            if "url" in result:
+                await schedule_photo_delete(result["url"])
+        raise
+
+
+@router.on_event("startup")
+async def start_delete_worker():
+    # Deletions journaled before a restart are drained without waiting for a new one
+    await resume_pending_deletes()
+
 
 @router.post("/profile-picture", status_code=status.HTTP_201_CREATED)
 async def upload_profile_picture(
         file: UploadFile = File(...),
         request: Request = None,
+        background_tasks: BackgroundTasks = None,
         db: Session = Depends(get_db)
 ):
     """Upload a user profile picture"""
@@ -37,28 +178,38 @@ async def upload_profile_picture(
         file_name=file.filename,
         content_type=file.content_type,
         file_prefix="profile-pictures",
-        metadata={"user_id": str(user_id)}
+        metadata={"user_id": str(user_id)},
+        limits=UPLOAD_LIMITS["profile-picture"]
     )
 
     # Update user profile in the database
     from ..auth.service import get_user_from_cognito_id, update_user
     from ..auth.schemas import UserUpdate
 
-    user = await get_user_from_cognito_id(db, user_id)
+    try:
+        user = await get_user_from_cognito_id(db, user_id)
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
 
-    # Delete previous profile picture if exists
-    if user.profile_pic:
-        await delete_file_from_s3(user.profile_pic)
+        # Update user with new profile picture URL
+        previous = user.profile_pic
+        user_update = UserUpdate(profile_pic=upload_result["url"])
+        updated_user = await update_user(db, user, user_update)
+    except Exception:
+        # Nothing references the new upload; collect it
+        await schedule_photo_delete(upload_result["url"])
+        raise
 
-    # Update user with new profile picture URL
-    user_update = UserUpdate(profile_pic=upload_result["url"])
-    updated_user = await update_user(db, user, user_update)
+    # Delete previous profile picture and its renditions in the background
+    await schedule_photo_delete(previous)
+
+    # Resize in the background, after the response is sent; stored content already has renditions
+    if not upload_result["deduplicated"]:
+        background_tasks.add_task(generate_renditions, upload_result["key"])
 
     return {
         "message": "Profile picture uploaded successfully",
@@ -71,6 +222,7 @@ async def upload_team_photo(
         team_id: int,
         file: UploadFile = File(...),
         request: Request = None,
+        background_tasks: BackgroundTasks = None,
         db: Session = Depends(get_db)
 ):
     """Upload a team photo"""
@@ -116,20 +268,30 @@ async def upload_team_photo(
         file_name=file.filename,
         content_type=file.content_type,
         file_prefix=f"team-photos/{team_id}",
-        metadata={"team_id": str(team_id)}
+        metadata={"team_id": str(team_id)},
+        limits=UPLOAD_LIMITS["team-photo"]
     )
 
     # Update team photo in the database
     from ..activity.service import update_team
     from ..activity.schemas import TeamUpdate
 
-    # Delete previous team photo if exists
-    if team.team_photo:
-        await delete_file_from_s3(team.team_photo)
-
     # Update team with new photo URL
+    previous = team.team_photo
     team_update = TeamUpdate(team_photo=upload_result["url"])
-    updated_team = await update_team(db, team_id, team_update, user.id)
+    try:
+        updated_team = await update_team(db, team_id, team_update, user.id)
+    except Exception:
+        # Nothing references the new upload; collect it
+        await schedule_photo_delete(upload_result["url"])
+        raise
+
+    # Delete previous team photo and its renditions in the background
+    await schedule_photo_delete(previous)
+
+    # Resize in the background, after the response is sent; stored content already has renditions
+    if not upload_result["deduplicated"]:
+        background_tasks.add_task(generate_renditions, upload_result["key"])
 
     return {
         "message": "Team photo uploaded successfully",
@@ -143,6 +305,7 @@ async def upload_activity_photos(
         files: List[UploadFile] = File(...),
         caption: str = None,
         request: Request = None,
+        background_tasks: BackgroundTasks = None,
         db: Session = Depends(get_db)
 ):
     """Upload photos for an activity"""
@@ -182,51 +345,47 @@ async def upload_activity_photos(
             detail="You must be a member of the team to upload photos"
         )
 
-    uploaded_photos = []
-
-    # Upload each file to S3
-    for file in files:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/png", "image/gif"]
-        if file.content_type not in allowed_types:
-            continue  # Skip invalid files
+    # Upload all files to S3 concurrently
+    results = await upload_files_concurrently(
+        files,
+        file_prefix=f"activity-photos/{activity_id}",
+        metadata={
+            "activity_id": str(activity_id),
+            "user_id": str(user.id)
+        },
+        limits=UPLOAD_LIMITS["activity-photo"]
+    )
+    uploaded_photos = [result["url"] for result in results if "url" in result]
 
-        # Upload file to S3
-        upload_result = await upload_file_to_s3(
-            file_content=file.file,
-            file_name=file.filename,
-            content_type=file.content_type,
-            file_prefix=f"activity-photos/{activity_id}",
-            metadata={
-                "activity_id": str(activity_id),
-                "user_id": str(user.id)
-            }
+    if not uploaded_photos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "No valid photos were uploaded", "results": results}
         )
 
-        # Create activity photo record
-        from ..activity.models import ActivityPhoto
+    # Create activity photo records
+    from ..activity.models import ActivityPhoto
 
-        photo = ActivityPhoto(
+    photos = [
+        ActivityPhoto(
             activity_id=activity_id,
             user_id=user.id,
-            photo_url=upload_result["url"],
+            photo_url=url,
             caption=caption
         )
+        for url in uploaded_photos
+    ]
+    await save_photo_records(db, photos, results)
 
-        db.add(photo)
-        uploaded_photos.append(upload_result["url"])
-
-    if not uploaded_photos:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No valid photos were uploaded"
-        )
-
-    db.commit()
+    # Resize in the background, after the response is sent
+    for result in results:
+        if "key" in result and not result["deduplicated"]:
+            background_tasks.add_task(generate_renditions, result["key"])
 
     return {
         "message": f"{len(uploaded_photos)} photos uploaded successfully",
-        "urls": uploaded_photos
+        "urls": uploaded_photos,
+        "results": results
     }
 
 
@@ -237,6 +396,7 @@ async def upload_venue_photos(
         caption: str = None,
         is_primary: bool = False,
         request: Request = None,
+        background_tasks: BackgroundTasks = None,
         db: Session = Depends(get_db)
 ):
     """Upload photos for a venue"""
@@ -275,27 +435,619 @@ async def upload_venue_photos(
             detail="Only the venue owner can upload photos"
         )
 
-    uploaded_photos = []
+    # Upload all files to S3 concurrently
+    results = await upload_files_concurrently(
+        files,
+        file_prefix=f"venue-photos/{venue_id}",
+        metadata={"venue_id": str(venue_id)},
+        limits=UPLOAD_LIMITS["venue-photo"]
+    )
+    uploaded_photos = [result["url"] for result in results if "url" in result]
+
+    if not uploaded_photos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "No valid photos were uploaded", "results": results}
+        )
+
+    # Create venue photo records
+    from ..venues.models import VenuePhoto
 
-    # Upload each file to S3
-    for file in files:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/png", "image/gif"]
-        if file.content_type not in allowed_types:
-            continue  # Skip invalid files
+    # If is_primary is True, the first uploaded photo replaces the current primary photo
+    if is_primary:
+        db.query(VenuePhoto).filter(VenuePhoto.venue_id == venue_id).update({"is_primary": False})
 
-        # Upload file to S3
-        upload_result = await upload_file_to_s3(
-            file_content=file.file,
-            file_name=file.filename,
-            content_type=file.content_type,
-            file_prefix=f"venue-photos/{venue_id}",
-            metadata={"venue_id": str(venue_id)}
+    photos = [
+        VenuePhoto(
+            venue_id=venue_id,
+            photo_url=url,
+            caption=caption,
+            is_primary=is_primary and i == 0
+        )
+        for i, url in enumerate(uploaded_photos)
+    ]
+    await save_photo_records(db, photos, results)
+
+    # Resize in the background, after the response is sent
+    for result in results:
+        if "key" in result and not result["deduplicated"]:
+            background_tasks.add_task(generate_renditions, result["key"])
+
+    return {
+        "message": f"{len(uploaded_photos)} photos uploaded successfully",
+        "urls": uploaded_photos,
+        "results": results
+    }
+
+
+class DirectUploadRequest(BaseModel):
+    target: UploadTarget
+    target_id: Optional[int] = None  # team, activity or venue id
+    file_name: str
+    content_type: str
+
+
+class DirectUploadCompletion(BaseModel):
+    target: UploadTarget
+    target_id: Optional[int] = None
+    key: str
+    caption: Optional[str] = None
+    is_primary: bool = False
+
+
+async def authorize_upload_target(db: Session, user_id: str, target: str, target_id: Optional[int]):
+    """
+    Check that the authenticated user may upload to a target
+
+    Returns:
+        tuple: (user, entity) where entity is the team, activity or venue,
+        or None for profile pictures
+    """
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
         )
 
-        # Create venue photo record
+    from ..auth.service import get_user_from_cognito_id
+    user = await get_user_from_cognito_id(db, user_id)
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    if target == "profile-picture":
+        return user, None
+
+    if target_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="target_id is required for this upload target"
+        )
+
+    if target == "team-photo":
+        from ..activity.service import get_team
+        entity = await get_team(db, target_id)
+        allowed = entity is not None and entity.leader_id == user.id
+        denied = "Only the team leader can update the team photo"
+    elif target == "activity-photo":
+        from ..activity.models import Activity
+        entity = db.query(Activity).filter(Activity.id == target_id).first()
+        allowed = entity is not None and (
+            user.id == entity.team.leader_id or user.id in [member.id for member in entity.team.members]
+        )
+        denied = "You must be a member of the team to upload photos"
+    else:
+        from ..venues.models import Venue
+        entity = db.query(Venue).filter(Venue.id == target_id).first()
+        allowed = entity is not None and entity.owner_id == user.id
+        denied = "Only the venue owner can upload photos"
+
+    if entity is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{target.split('-')[0].capitalize()} not found"
+        )
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=denied
+        )
+    return user, entity
+
+
+def upload_target_prefix(target: str, target_id: Optional[int]) -> str:
+    """S3 folder for direct uploads to a target"""
+    prefix = UPLOAD_TARGET_PREFIXES[target]
+    return prefix if target == "profile-picture" else f"{prefix}/{target_id}"
+
+
+@router.post("/direct", status_code=status.HTTP_201_CREATED)
+async def create_direct_upload(
+        upload: DirectUploadRequest,
+        request: Request = None,
+        db: Session = Depends(get_db)
+):
+    """
+    Issue a presigned POST policy for uploading a photo straight to S3
+
+    The client POSTs the file to upload_url with the returned fields, then
+    calls /uploads/direct/complete with the key. Uploads that are never
+    completed are deleted once DIRECT_UPLOAD_GRACE has passed.
+    """
+    user_id = request.state.user_id
+    await authorize_upload_target(db, user_id, upload.target, upload.target_id)
+
+    if upload.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only JPEG, PNG, and GIF images are allowed"
+        )
+
+    presigned = await generate_presigned_post(
+        file_prefix=upload_target_prefix(upload.target, upload.target_id),
+        file_name=upload.file_name,
+        content_type=upload.content_type,
+        max_size=UPLOAD_LIMITS[upload.target].max_bytes,
+        metadata={"uploaded_by": str(user_id)}
+    )
+    presigned["max_size"] = UPLOAD_LIMITS[upload.target].max_bytes
+
+    # Collect the file unless the upload is completed in time
+    await schedule_photo_delete(presigned["file_url"], delay=presigned["expires_in"] + DIRECT_UPLOAD_GRACE)
+    return presigned
+
+
+@router.post("/direct/complete", status_code=status.HTTP_201_CREATED)
+async def complete_direct_upload(
+        completion: DirectUploadCompletion,
+        request: Request = None,
+        background_tasks: BackgroundTasks = None,
+        db: Session = Depends(get_db)
+):
+    """Verify a photo uploaded with a presigned POST and record it"""
+    user_id = request.state.user_id
+    user, entity = await authorize_upload_target(db, user_id, completion.target, completion.target_id)
+
+    prefix = upload_target_prefix(completion.target, completion.target_id)
+    if not completion.key.startswith(f"{prefix}/") or "/" in completion.key[len(prefix) + 1:]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Key does not belong to this upload target"
+        )
+
+    stored = await head_file_in_s3(completion.key)
+    if stored is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Uploaded file not found"
+        )
+    if stored["metadata"].get("uploaded_by") != str(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="File was uploaded by another user"
+        )
+    url = f"{S3_BASE_URL}{completion.key}"
+
+    # The policy only bounds size and the declared type; check the stored bytes themselves
+    limits = UPLOAD_LIMITS[completion.target]
+    try:
+        if stored["content_type"] not in ALLOWED_IMAGE_TYPES or not 0 < stored["size"] <= limits.max_bytes:
+            raise MediaValidationError("Uploaded file is not a valid photo")
+        head = await read_file_head(completion.key, min(stored["size"], MAX_HEADER_BYTES))
+        check_header(head, limits, complete=True)
+    except MediaValidationError as e:
+        # Not cancelling the orphan deletion scheduled with the policy collects the file
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e)
+        )
+
+    if completion.target == "profile-picture":
+        from ..auth.service import update_user
+        from ..auth.schemas import UserUpdate
+
+        if user.profile_pic != url:
+            previous = user.profile_pic
+            await update_user(db, user, UserUpdate(profile_pic=url))
+            await schedule_photo_delete(previous)
+
+    elif completion.target == "team-photo":
+        from ..activity.service import update_team
+        from ..activity.schemas import TeamUpdate
+
+        if entity.team_photo != url:
+            previous = entity.team_photo
+            await update_team(db, entity.id, TeamUpdate(team_photo=url), user.id)
+            await schedule_photo_delete(previous)
+
+    elif completion.target == "activity-photo":
+        from ..activity.models import ActivityPhoto
+
+        # Completing the same upload twice records it once
+        if not db.query(ActivityPhoto).filter(ActivityPhoto.photo_url == url).first():
+            db.add(ActivityPhoto(
+                activity_id=entity.id,
+                user_id=user.id,
+                photo_url=url,
+                caption=completion.caption
+            ))
+            db.commit()
+
+    else:
         from ..venues.models import VenuePhoto
 
-        # If this is a primary photo and is_primary is True, set all other photos to not primary
-        if is_primary:
-            db.query(VenuePhoto
\ No newline at end of file
+        if not db.query(VenuePhoto).filter(VenuePhoto.photo_url == url).first():
+            if completion.is_primary:
+                db.query(VenuePhoto).filter(VenuePhoto.venue_id == entity.id).update({"is_primary": False})
+            db.add(VenuePhoto(
+                venue_id=entity.id,
+                photo_url=url,
+                caption=completion.caption,
+                is_primary=completion.is_primary
+            ))
+            db.commit()
+
+    # The upload is recorded, so it no longer counts as orphaned
+    await cancel_photo_delete(url)
+
+    # Resize in the background, after the response is sent
+    background_tasks.add_task(generate_renditions, completion.key)
+
+    return {
+        "message": "Upload completed successfully",
+        "url": url
+    }
+
+
+class SignRequest(BaseModel):
+    keys: List[str]
+    expiration: int = 3600
+
+
+@router.post("/sign")
+async def sign_file_keys(
+        sign: SignRequest,
+        request: Request = None
+):
+    """
+    Presigned GET URLs for many photos in one call
+
+    Only photo folders can be signed. URLs are memoized per key, so a
+    gallery page asking for the same keys again costs no signing work.
+    """
+    if not request.state.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+
+    if len(sign.keys) > MAX_SIGNED_URLS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SIGNED_URLS_PER_REQUEST} keys can be signed at once"
+        )
+
+    if not 60 <= sign.expiration <= 7 * 24 * 3600:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expiration must be between 1 minute and 7 days"
+        )
+
+    # Keys or stored photo URLs
+    keys = [file_key_from_url(key) if key.startswith(S3_BASE_URL) else key for key in sign.keys]
+    allowed_prefixes = tuple(f"{prefix}/" for prefix in (*UPLOAD_TARGET_PREFIXES.values(), CONTENT_PREFIX))
+    for key in keys:
+        if not key.startswith(allowed_prefixes) or ".." in key.split("/"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Key cannot be signed: {key}"
+            )
+
+    urls = await generate_presigned_urls(keys, sign.expiration)
+    return {"urls": urls, "expires_in": sign.expiration}
+
+
+class ResumableUploadRequest(BaseModel):
+    activity_id: int
+    file_name: str
+    content_type: str
+    total_size: int
+    caption: Optional[str] = None
+
+
+async def get_upload_session(db: Session, user_id: str, session_id: str):
+    """Active upload session of the authenticated user, or an HTTP error"""
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+
+    from ..activity.models import UploadSession
+    from ..auth.service import get_user_from_cognito_id
+
+    user = await get_user_from_cognito_id(db, user_id)
+    upload_session = db.query(UploadSession).filter(UploadSession.id == session_id).first()
+
+    if not user or not upload_session or upload_session.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    return upload_session
+
+
+async def expire_upload_sessions(db: Session, limit: int = 10) -> int:
+    """
+    Abort S3 uploads of sessions that were abandoned before completion
+
+    Every new session expires a few old ones; an AbortIncompleteMultipartUpload
+    bucket lifecycle rule is the safety net for sessions this never reaches.
+
+    Returns:
+        Number of sessions expired
+    """
+    from ..activity.models import UploadSession
+    from ..activity.enums import UploadSessionStatus
+
+    expired = db.query(UploadSession).filter(
+        UploadSession.status == UploadSessionStatus.ACTIVE,
+        UploadSession.expires_at < datetime.utcnow()
+    ).limit(limit).all()
+
+    for upload_session in expired:
+        if await abort_multipart_upload(upload_session.file_key, upload_session.upload_id):
+            upload_session.status = UploadSessionStatus.EXPIRED
+    db.commit()
+    return len(expired)
+
+
+def upload_session_status(upload_session, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    part_count = max(math.ceil(upload_session.total_size / upload_session.part_size), 1)
+    received = {part["part_number"] for part in parts}
+    return {
+        "session_id": upload_session.id,
+        "status": upload_session.status,
+        "key": upload_session.file_key,
+        "total_size": upload_session.total_size,
+        "part_size": upload_session.part_size,
+        "part_count": part_count,
+        "received_parts": parts,
+        "missing_parts": [number for number in range(1, part_count + 1) if number not in received],
+        "expires_at": upload_session.expires_at,
+    }
+
+
+@router.post("/resumable", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+        upload: ResumableUploadRequest,
+        request: Request = None,
+        db: Session = Depends(get_db)
+):
+    """
+    Start a resumable activity photo upload
+
+    The client PUTs each part (part_size bytes, the last one may be
+    shorter) to /uploads/resumable/{session_id}/parts/{part_number} in any
+    order and in parallel, retries the parts listed as missing by the
+    status endpoint after a dropped connection, and finally calls
+    /uploads/resumable/{session_id}/complete.
+    """
+    user, activity = await authorize_upload_target(db, request.state.user_id, "activity-photo", upload.activity_id)
+
+    if upload.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only JPEG, PNG, and GIF images are allowed"
+        )
+    if not 0 < upload.total_size <= RESUMABLE_UPLOAD_LIMITS.max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File must be at most {RESUMABLE_UPLOAD_LIMITS.max_bytes // (1024 * 1024)} MB"
+        )
+
+    multipart = await create_multipart_upload(
+        file_prefix=f"activity-photos/{activity.id}",
+        file_name=upload.file_name,
+        content_type=upload.content_type,
+        metadata={
+            "activity_id": str(activity.id),
+            "user_id": str(user.id)
+        }
+    )
+
+    from ..activity.models import UploadSession
+
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        activity_id=activity.id,
+        user_id=user.id,
+        file_key=multipart["key"],
+        upload_id=multipart["upload_id"],
+        file_name=upload.file_name,
+        content_type=upload.content_type,
+        caption=upload.caption,
+        total_size=upload.total_size,
+        part_size=RESUMABLE_PART_SIZE,
+        expires_at=datetime.utcnow() + RESUMABLE_SESSION_TTL
+    )
+    try:
+        db.add(upload_session)
+        db.commit()
+    except Exception:
+        db.rollback()
+        await abort_multipart_upload(multipart["key"], multipart["upload_id"])
+        raise
+
+    await expire_upload_sessions(db)
+
+    return upload_session_status(upload_session, [])
+
+
+@router.put("/resumable/{session_id}/parts/{part_number}")
+async def upload_resumable_part(
+        session_id: str,
+        part_number: int,
+        request: Request = None,
+        db: Session = Depends(get_db)
+):
+    """Store one part of a resumable upload; the request body is the raw bytes"""
+    from ..activity.enums import UploadSessionStatus
+
+    upload_session = await get_upload_session(db, request.state.user_id, session_id)
+    if upload_session.status != UploadSessionStatus.ACTIVE or upload_session.expires_at < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Upload session is {upload_session.status}"
+        )
+
+    part_count = max(math.ceil(upload_session.total_size / upload_session.part_size), 1)
+    if not 1 <= part_number <= part_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Part number must be between 1 and {part_count}"
+        )
+
+    # Every part but the last has exactly part_size bytes
+    expected_size = upload_session.part_size
+    if part_number == part_count:
+        expected_size = upload_session.total_size - upload_session.part_size * (part_count - 1)
+
+    declared_size = request.headers.get("content-length")
+    if declared_size is not None and declared_size.isdigit() and int(declared_size) != expected_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Part {part_number} must be {expected_size} bytes"
+        )
+
+    body = await request.body()
+    if len(body) != expected_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Part {part_number} must be {expected_size} bytes"
+        )
+
+    # The first part carries the image header: reject bad files before the rest is sent
+    if part_number == 1:
+        try:
+            content_type = check_header(body[:MAX_HEADER_BYTES], RESUMABLE_UPLOAD_LIMITS, complete=True)
+        except MediaValidationError as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=str(e)
+            )
+        if content_type != upload_session.content_type:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File content is {content_type}, not {upload_session.content_type}"
+            )
+
+    etag = await upload_part_to_s3(upload_session.file_key, upload_session.upload_id, part_number, body)
+
+    return {"part_number": part_number, "size": len(body), "etag": etag}
+
+
+@router.get("/resumable/{session_id}")
+async def get_resumable_upload(
+        session_id: str,
+        request: Request = None,
+        db: Session = Depends(get_db)
+):
+    """Progress of a resumable upload: received and missing parts"""
+    from ..activity.enums import UploadSessionStatus
+
+    upload_session = await get_upload_session(db, request.state.user_id, session_id)
+    parts = []
+    if upload_session.status == UploadSessionStatus.ACTIVE:
+        parts = await list_uploaded_parts(upload_session.file_key, upload_session.upload_id)
+
+    result = upload_session_status(upload_session, parts)
+    if upload_session.photo_id is not None:
+        result["photo_id"] = upload_session.photo_id
+    return result
+
+
+@router.post("/resumable/{session_id}/complete", status_code=status.HTTP_201_CREATED)
+async def complete_resumable_upload(
+        session_id: str,
+        request: Request = None,
+        background_tasks: BackgroundTasks = None,
+        db: Session = Depends(get_db)
+):
+    """Assemble the parts and record the file as an activity photo; repeating the call is harmless"""
+    from ..activity.enums import UploadSessionStatus
+    from ..activity.models import ActivityPhoto
+
+    upload_session = await get_upload_session(db, request.state.user_id, session_id)
+    url = f"{S3_BASE_URL}{upload_session.file_key}"
+
+    if upload_session.status == UploadSessionStatus.COMPLETED:
+        return {"message": "Upload completed successfully", "url": url, "photo_id": upload_session.photo_id}
+    if upload_session.status != UploadSessionStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Upload session is {upload_session.status}"
+        )
+
+    parts = await list_uploaded_parts(upload_session.file_key, upload_session.upload_id)
+    missing = upload_session_status(upload_session, parts)["missing_parts"]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is missing parts", "missing_parts": missing}
+        )
+    if sum(part["size"] for part in parts) != upload_session.total_size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Uploaded parts do not add up to the declared size"
+        )
+
+    await complete_multipart_upload(upload_session.file_key, upload_session.upload_id, parts)
+
+    photo = ActivityPhoto(
+        activity_id=upload_session.activity_id,
+        user_id=upload_session.user_id,
+        photo_url=url,
+        caption=upload_session.caption
+    )
+    try:
+        db.add(photo)
+        db.flush()
+        upload_session.status = UploadSessionStatus.COMPLETED
+        upload_session.photo_id = photo.id
+        db.commit()
+    except Exception:
+        db.rollback()
+        await schedule_photo_delete(url)
+        raise
+
+    # Resize in the background, after the response is sent
+    background_tasks.add_task(generate_renditions, upload_session.file_key)
+
+    return {"message": "Upload completed successfully", "url": url, "photo_id": photo.id}
+
+
+@router.delete("/resumable/{session_id}")
+async def abort_resumable_upload(
+        session_id: str,
+        request: Request = None,
+        db: Session = Depends(get_db)
+):
+    """Cancel a resumable upload and discard its parts"""
+    from ..activity.enums import UploadSessionStatus
+
+    upload_session = await get_upload_session(db, request.state.user_id, session_id)
+    if upload_session.status != UploadSessionStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload session is {upload_session.status}"
+        )
+
+    await abort_multipart_upload(upload_session.file_key, upload_session.upload_id)
+    upload_session.status = UploadSessionStatus.ABORTED
+    db.commit()
+
+    return {"message": "Upload aborted"}
@@ -0,0 +1,83 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from s3_database import S3Database
+
+
+class AsyncS3Database:
+    def __init__(self, db, max_concurrency=None, timeout=None):
+        """
+        Async facade over S3Database for use from FastAPI handlers
+
+        Blocking boto3 calls run on a dedicated, bounded thread pool so the
+        event loop keeps serving other requests during S3 round trips. The
+        pool matches the botocore connection pool of the wrapped database so
+        every worker thread can hold a pooled connection.
+
+        Args:
+            db (S3Database): Database to wrap
+            max_concurrency (int): Maximum S3 calls in flight from this
+                facade; extra callers wait without holding a thread
+            timeout (float): Optional per-call timeout in seconds
+        """
+        self.db = db
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency or db.max_pool_connections
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, db.max_pool_connections),
+            thread_name_prefix="s3db-async"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @classmethod
+    def create(cls, bucket_name, region_name='us-east-1', max_concurrency=None, timeout=None, **kwargs):
+        """Construct the underlying S3Database and wrap it"""
+        db = S3Database(bucket_name, region_name=region_name, **kwargs)
+        return cls(db, max_concurrency=max_concurrency, timeout=timeout)
+
+    async def _call(self, func, *args, **kwargs):
+        """
+        Run a blocking database call off the event loop
+
+        Cancelling the awaiting task (or hitting the timeout) releases the
+        caller immediately; a call that has not started yet is dropped, one
+        already on the wire finishes in the background.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            if self.timeout is None:
+                return await future
+            return await asyncio.wait_for(future, self.timeout)
+
+    async def save_data(self, key, data):
+        """Save data to S3"""
+        return await self._call(self.db.save_data, key, data)
+
+    async def load_data(self, key):
+        """Load data from S3, or None if key doesn't exist"""
+        return await self._call(self.db.load_data, key)
+
+    async def delete_data(self, key):
+        """Delete data from S3"""
+        return await self._call(self.db.delete_data, key)
+
+    async def list_keys(self, prefix=""):
+        """List all keys in the bucket with given prefix"""
+        return await self._call(self.db.list_keys, prefix)
+
+    async def list_page(self, prefix="", page_size=100, cursor=None, delimiter=None):
+        """List a single page of keys for cursor-based pagination"""
+        return await self._call(self.db.list_page, prefix, page_size, cursor, delimiter)
+
+    async def close(self):
+        """Wait for in-flight calls and shut down the worker pool"""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
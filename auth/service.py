@@ -1,22 +1,24 @@
-import boto3
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from .models import User
 from .schemas import UserCreate, UserUpdate, CognitoTokenResponse
+from aws_clients import get_client
 
 # AWS Cognito configuration
 COGNITO_USER_POOL_ID = "user-pool-id"  # Replace with your pool ID
 COGNITO_APP_CLIENT_ID = "client-id"  # Replace with your client ID
 COGNITO_REGION = "aws-region"  # e.g., "us-east-1"
 
-# Initialize Cognito client
-cognito_client = boto3.client('cognito-idp', region_name=COGNITO_REGION)
+
+def get_cognito_client():
+    """Shared Cognito client, created on first use instead of at import time"""
+    return get_client('cognito-idp', COGNITO_REGION)
 
 
 async def sign_up_user(user_data: UserCreate):
     """Register a new user with Cognito"""
     try:
-        response = cognito_client.sign_up(
+        response = get_cognito_client().sign_up(
             ClientId=COGNITO_APP_CLIENT_ID,
             Username=user_data.username,
             Password=user_data.password,
@@ -32,12 +34,12 @@ async def sign_up_user(user_data: UserCreate):
             ]
         )
         return response
-    except cognito_client.exceptions.UsernameExistsException:
+    except get_cognito_client().exceptions.UsernameExistsException:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists"
         )
-    except cognito_client.exceptions.InvalidPasswordException:
+    except get_cognito_client().exceptions.InvalidPasswordException:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password does not meet requirements"
@@ -52,7 +54,7 @@ async def sign_up_user(user_data: UserCreate):
 async def confirm_sign_up(username: str, confirmation_code: str):
     """Confirm user registration with the code they received"""
     try:
-        response = cognito_client.confirm_sign_up(
+        response = get_cognito_client().confirm_sign_up(
             ClientId=COGNITO_APP_CLIENT_ID,
             Username=username,
             ConfirmationCode=confirmation_code
@@ -68,7 +70,7 @@ async def confirm_sign_up(username: str, confirmation_code: str):
 async def authenticate_user(username: str, password: str) -> CognitoTokenResponse:
     """Authenticate user and return tokens"""
     try:
-        response = cognito_client.initiate_auth(
+        response = get_cognito_client().initiate_auth(
             ClientId=COGNITO_APP_CLIENT_ID,
             AuthFlow="USER_PASSWORD_AUTH",
             AuthParameters={
@@ -91,7 +93,7 @@ async def authenticate_user(username: str, password: str) -> CognitoTokenRespons
             token_type=auth_result.get("TokenType"),
             expires_in=auth_result.get("ExpiresIn")
         )
-    except cognito_client.exceptions.NotAuthorizedException:
+    except get_cognito_client().exceptions.NotAuthorizedException:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -106,7 +108,7 @@ async def authenticate_user(username: str, password: str) -> CognitoTokenRespons
 async def refresh_tokens(refresh_token: str) -> CognitoTokenResponse:
     """Refresh user tokens using a refresh token"""
     try:
-        response = cognito_client.initiate_auth(
+        response = get_cognito_client().initiate_auth(
             ClientId=COGNITO_APP_CLIENT_ID,
             AuthFlow="REFRESH_TOKEN_AUTH",
             AuthParameters={
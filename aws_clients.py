@@ -0,0 +1,78 @@
+import threading
+
+# Connection pool per client; sized for the bulk and async worker pools
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+
+# Standard retry mode: exponential backoff with jitter, also on throttling
+DEFAULT_RETRIES = {"mode": "standard", "max_attempts": 5}
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide boto3 session, created on first use"""
+    global _session
+    if _session is None:
+        # Imported here: boto3 and s3transfer dominate import time
+        import boto3.session
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name, region_name=None, max_pool_connections=None):
+    """
+    Shared, lazily created boto3 client
+
+    Clients are thread-safe and expensive to build (service model loading,
+    credential resolution), so every module asks this registry instead of
+    calling boto3.client at import time. All clients come from a single
+    session and share the retry and timeout settings above.
+
+    Args:
+        service_name (str): e.g. "s3" or "cognito-idp"
+        region_name (str): AWS region name (default: session region)
+        max_pool_connections (int): Size of the client's connection pool
+
+    Returns:
+        botocore client, the same object for the same arguments
+    """
+    max_pool_connections = max_pool_connections or DEFAULT_MAX_POOL_CONNECTIONS
+    cache_key = (service_name, region_name, max_pool_connections)
+
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    from botocore.config import Config
+
+    session = get_session()
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            client = session.client(
+                service_name,
+                region_name=region_name,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    retries=DEFAULT_RETRIES,
+                    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                    read_timeout=DEFAULT_READ_TIMEOUT
+                )
+            )
+            _clients[cache_key] = client
+    return client
+
+
+def reset():
+    """Forget the session and all clients, e.g. after fork or in benchmarks"""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
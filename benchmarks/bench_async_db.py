@@ -0,0 +1,79 @@
+"""
+Single-worker load test: blocking S3Database calls vs AsyncS3Database
+
+Simulates async request handlers that each read one record from a store
+with fixed S3-like latency, all on one event loop. With the blocking
+store every round trip stalls the loop; with AsyncS3Database requests
+overlap up to the concurrency limit.
+
+Usage:
+    python benchmarks/bench_async_db.py [--requests 500] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_s3_database import AsyncS3Database  # noqa: E402
+
+
+class LatencyStore:
+    """Stand-in for S3Database whose calls block for a fixed round trip"""
+
+    def __init__(self, latency, max_pool_connections):
+        self.latency = latency
+        self.max_pool_connections = max_pool_connections
+
+    def load_data(self, key):
+        time.sleep(self.latency)
+        return {"key": key}
+
+
+async def run(handler, requests, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(f"users/user{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent in-flight requests")
+    parser.add_argument("--pool", type=int, default=32, help="max_pool_connections")
+    args = parser.parse_args()
+
+    store = LatencyStore(args.latency_ms / 1000, args.pool)
+
+    async def blocking_handler(key):
+        return store.load_data(key)
+
+    async with AsyncS3Database(store) as async_db:
+        results = {
+            "blocking S3Database": await run(blocking_handler, args.requests, args.clients),
+            "AsyncS3Database": await run(async_db.load_data, args.requests, args.clients),
+        }
+
+    print(f"{'mode':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, (rps, p50, p99) in results.items():
+        print(f"{mode:<22}{rps:>10.1f}{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Per-request overhead of CognitoAuthMiddleware
+
+Runs dispatch() directly with a fixed RS256 access token and a no-op
+downstream handler, so the numbers are the middleware's own cost. Compares
+parsing the JWK and verifying the signature on every request (the previous
+behavior), verifying with the pre-parsed key, and the verified-token cache
+that repeat requests with the same token hit.
+
+Usage:
+    python benchmarks/bench_auth.py [--requests 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from middleware.auth_middleware import CognitoAuthMiddleware  # noqa: E402
+
+KID = "bench-key"
+
+
+def make_key_set():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": KID, "alg": "RS256", "use": "sig"})
+    return private_key, {"keys": [jwk]}
+
+
+class BenchMiddleware(CognitoAuthMiddleware):
+    """Serves a local key set instead of fetching it from Cognito"""
+
+    def __init__(self, jwks, parse_per_request=False, cache_tokens=True):
+        super().__init__(None)
+        self._jwks = jwks
+        self.parse_per_request = parse_per_request
+        if not cache_tokens:
+            self.verified_tokens.max_entries = 0
+
+    def _get_jwks(self):
+        return self._jwks
+
+    async def _get_public_key(self, kid):
+        key = await super()._get_public_key(kid)
+        if self.parse_per_request and key is not None:
+            # The previous behavior: turn the JWK into a key object on every request
+            return jwt.PyJWK(next(jwk for jwk in self._jwks["keys"] if jwk["kid"] == kid)).key
+        return key
+
+
+def make_request(token):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/v1/activities",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "query_string": b"",
+    })
+
+
+async def call_next(request):
+    assert request.state.user_id is not None, "token was rejected"
+    return Response()
+
+
+async def run(middleware, token, requests):
+    # Warm-up: loads the key set and, with caching, verifies the token once
+    await middleware.dispatch(make_request(token), call_next)
+
+    latencies = []
+    for _ in range(requests):
+        request = make_request(token)
+        start = time.perf_counter()
+        await middleware.dispatch(request, call_next)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.mean(latencies), statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    private_key, jwks = make_key_set()
+    token = jwt.encode(
+        {"sub": "bench-user", "aud": "client-id", "exp": int(time.time()) + 3600},
+        private_key,
+        algorithm="RS256",
+        headers={"kid": KID}
+    )
+
+    modes = [
+        ("parse JWK + verify", dict(parse_per_request=True, cache_tokens=False)),
+        ("pre-parsed + verify", dict(cache_tokens=False)),
+        ("token cache hit", dict()),
+    ]
+    print(f"{'mode':<22}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, options in modes:
+        mean, p50, p99 = asyncio.run(run(BenchMiddleware(jwks, **options), token, args.requests))
+        print(f"{name:<22}{mean * 1e6:>10.1f}{p50 * 1e6:>10.1f}{p99 * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
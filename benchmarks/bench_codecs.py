@@ -0,0 +1,123 @@
+"""
+Compare S3Database payload codecs on realistic user and venue records
+
+Reports encode/decode time per record and stored object size for every
+codec available in this environment, next to the legacy json.dumps format.
+
+Usage:
+    python benchmarks/bench_codecs.py [--records 2000] [--rounds 5]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from s3_codecs import available_codecs, decode  # noqa: E402
+
+
+def _word(rng, n):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def make_user(rng, i):
+    return {
+        "id": i,
+        "username": f"user{i}",
+        "email": f"user{i}@example.com",
+        "name": f"{_word(rng, 6).title()} {_word(rng, 9).title()}",
+        "cognito_id": f"{rng.getrandbits(128):032x}",
+        "bio": " ".join(_word(rng, rng.randint(3, 9)) for _ in range(rng.randint(5, 30))),
+        "location": rng.choice(["Warszawa", "Kraków", "Gdańsk", "Wrocław", "Poznań"]),
+        "gender": rng.choice(["male", "female", "other"]),
+        "dob": f"19{rng.randint(60, 99)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "profile_pic": f"https://bucket.s3.eu-central-1.amazonaws.com/profile-pictures/{rng.getrandbits(64):016x}.jpg",
+        "friends_count": rng.randint(0, 500),
+        "teams_count": rng.randint(0, 20),
+        "created_dt": "2024-05-01T12:00:00",
+    }
+
+
+def make_venue(rng, i):
+    return {
+        "id": i,
+        "name": f"{_word(rng, 8).title()} Arena",
+        "description": " ".join(_word(rng, rng.randint(3, 10)) for _ in range(rng.randint(20, 80))),
+        "venue_type": rng.choice(["sports_facility", "park", "gym", "court"]),
+        "status": "active",
+        "address": f"ul. {_word(rng, 10).title()} {rng.randint(1, 200)}",
+        "city": rng.choice(["Warszawa", "Kraków", "Gdańsk"]),
+        "latitude": rng.uniform(49.0, 54.8),
+        "longitude": rng.uniform(14.1, 24.1),
+        "owner_id": rng.randint(1, 10000),
+        "contact_email": f"venue{i}@example.com",
+        "contact_phone": f"+48 {rng.randint(100000000, 999999999)}",
+        "business_hours": "Mon-Fri 08:00-22:00, Sat-Sun 10:00-20:00",
+        "price_per_hour": round(rng.uniform(20, 300), 2),
+        "photos": [
+            {"id": j, "photo_url": f"https://bucket.s3.amazonaws.com/venue-photos/{i}/{rng.getrandbits(64):016x}.jpg",
+             "caption": _word(rng, 12), "is_primary": j == 0}
+            for j in range(rng.randint(1, 8))
+        ],
+    }
+
+
+def bench(name, encode, decode_body, records, rounds):
+    encoded = [encode(r) for r in records]
+    size = sum(len(body) for body, _ in encoded)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            encode(record)
+    encode_us = (time.perf_counter() - start) / (rounds * len(records)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for body, args in encoded:
+            decode_body(body, args)
+    decode_us = (time.perf_counter() - start) / (rounds * len(records)) * 1e6
+
+    return name, encode_us, decode_us, size / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    datasets = {
+        "users": [make_user(rng, i) for i in range(args.records)],
+        "venues": [make_venue(rng, i) for i in range(args.records)],
+    }
+
+    for dataset, records in datasets.items():
+        rows = [bench(
+            "legacy json.dumps",
+            lambda r: (json.dumps(r).encode(), {}),
+            lambda body, _: json.loads(body),
+            records, args.rounds
+        )]
+        for codec in available_codecs():
+            rows.append(bench(
+                codec.name,
+                codec.encode,
+                lambda body, put_args: decode(body, put_args["Metadata"], put_args.get("ContentEncoding")),
+                records, args.rounds
+            ))
+
+        baseline = rows[0][3]
+        print(f"\n{dataset} ({len(records)} records)")
+        print(f"{'codec':<20}{'encode us':>12}{'decode us':>12}{'bytes':>10}{'ratio':>8}")
+        for name, encode_us, decode_us, size in rows:
+            print(f"{name:<20}{encode_us:>12.2f}{decode_us:>12.2f}{size:>10.0f}{size / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold start cost: imports, client creation and database construction
+
+Each stage runs in a fresh interpreter so module and client caches start
+empty, as they do in a new worker or serverless instance, and is timed
+inside it. The interpreter baseline is the wall time of a bare
+"python -c pass" subprocess, for scale. Construction
+stages should stay near zero: AWS clients are created on first use and
+no network I/O happens until the first real call.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    ("import s3_database", "", "import s3_database"),
+    ("import main", "", "import main"),
+    ("S3Database()", "from s3_database import S3Database", "S3Database('startup-bench-bucket')"),
+    ("first s3 client", "import aws_clients", "aws_clients.get_client('s3', 'us-east-1')"),
+    ("cached s3 client", "import aws_clients; aws_clients.get_client('s3', 'us-east-1')",
+     "aws_clients.get_client('s3', 'us-east-1')"),
+    ("auth middleware", "from middleware.auth_middleware import CognitoAuthMiddleware",
+     "CognitoAuthMiddleware(None)"),
+]
+
+SNIPPET = """
+import time
+{setup}
+start = time.perf_counter()
+{stage}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure(setup, stage, repeat):
+    env = dict(os.environ, STORAGE_BACKEND=os.environ.get("STORAGE_BACKEND", "s3"))
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(setup=setup, stage=stage)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples), max(samples)
+
+
+def measure_interpreter(repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'stage':<20}{'median ms':>12}{'max ms':>10}")
+    median, worst = measure_interpreter(args.repeat)
+    print(f"{'interpreter':<20}{median:>12.2f}{worst:>10.2f}")
+    for name, setup, stage in STAGES:
+        median, worst = measure(setup, stage, args.repeat)
+        print(f"{name:<20}{median:>12.2f}{worst:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Storage benchmark: main.py user operations against each S3Database backend
+
+Runs save_user, get_user, list_users and delete_user at scale against the
+in-memory backend, a local directory and (optionally) a real S3 bucket,
+and reports throughput with p50/p99 latency per operation.
+
+Usage:
+    python benchmarks/bench_storage.py [--users 2000] [--backends memory local]
+    python benchmarks/bench_storage.py --backends s3 --bucket my-bench-bucket
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py builds its database at import time; keep that off the network
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import main  # noqa: E402
+from s3_database import S3Database  # noqa: E402
+
+
+def make_user(i):
+    return {
+        "name": f"Użytkownik {i}",
+        "email": f"user{i}@example.com",
+        "username": f"user{i}",
+        "age": 18 + i % 60,
+        "bio": "Lubię bieganie, rower i siatkówkę plażową." * 3,
+    }
+
+
+def timed(func, args_list):
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return len(latencies) / elapsed, statistics.median(latencies), p99
+
+
+def run(backend_name, backend, users, list_rounds, bucket, region):
+    main.db = S3Database(bucket, region_name=region, indexes=main.INDEXES, layout=main.LAYOUT, backend=backend,
+                          segments=main.SEGMENTS)
+    ids = [f"bench{i:07d}" for i in range(users)]
+
+    results = {
+        "save_user": timed(main.save_user, [(i, make_user(n)) for n, i in enumerate(ids)]),
+        "get_user": timed(main.get_user, [(i,) for i in ids]),
+        "list_users": timed(main.list_users, [()] * list_rounds),
+        "delete_user": timed(main.delete_user, [(i,) for i in ids]),
+    }
+    main.db.close()
+
+    for op, (ops, p50, p99) in results.items():
+        print(f"{backend_name:<8}{op:<14}{ops:>12.1f}{p50 * 1000:>10.3f}{p99 * 1000:>10.3f}")
+
+
+def run_all():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--list-rounds", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["memory", "local"], choices=["memory", "local", "s3"])
+    parser.add_argument("--bucket", default=main.BUCKET_NAME)
+    parser.add_argument("--region", default=main.AWS_REGION)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8}{'operation':<14}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for name in args.backends:
+        if name == "local":
+            with tempfile.TemporaryDirectory() as path:
+                run(name, main.create_backend("local", path), args.users, args.list_rounds, args.bucket, args.region)
+        elif name == "memory":
+            run(name, main.create_backend("memory"), args.users, args.list_rounds, args.bucket, args.region)
+        else:
+            run(name, None, args.users, args.list_rounds, args.bucket, args.region)
+
+
+if __name__ == "__main__":
+    run_all()
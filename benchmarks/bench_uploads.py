@@ -0,0 +1,103 @@
+"""
+Mixed traffic on one event loop: photo uploads alongside record reads
+
+Reader tasks keep issuing AsyncS3Database reads against a store with
+fixed S3-like latency while upload tasks push files through
+upload_file_to_s3 to an in-process mock S3 (moto). Compares the previous
+blocking upload_fileobj call inside the coroutine with the off-loop
+transfer path; read latency should no longer spike while uploads run.
+
+Usage:
+    python benchmarks/bench_uploads.py [--uploads 40] [--size-kb 2048]
+"""
+import argparse
+import asyncio
+import importlib
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# utils.s3_service uses package-relative imports, so load it through the repo's parent
+sys.path.insert(0, os.path.dirname(ROOT))
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+from moto import mock_aws  # noqa: E402
+
+from async_s3_database import AsyncS3Database  # noqa: E402
+from bench_async_db import LatencyStore  # noqa: E402
+
+
+async def blocking_upload(s3_service, body):
+    """The previous implementation: a synchronous transfer inside the coroutine"""
+    s3_service.get_s3_client().upload_fileobj(
+        io.BytesIO(body),
+        s3_service.S3_BUCKET_NAME,
+        s3_service.generate_file_key("bench", "photo.jpg"),
+        ExtraArgs={"ContentType": "image/jpeg"}
+    )
+
+
+async def offloop_upload(s3_service, body):
+    await s3_service.upload_file_to_s3(io.BytesIO(body), "photo.jpg", "image/jpeg", file_prefix="bench",
+                                       public=False)
+
+
+async def run(upload, s3_service, args):
+    db = AsyncS3Database(LatencyStore(args.read_latency_ms / 1000, 32))
+    body = os.urandom(args.size_kb * 1024)
+    latencies = []
+    done = asyncio.Event()
+
+    async def reader(i):
+        while not done.is_set():
+            start = time.perf_counter()
+            await db.load_data(f"users/user{i}")
+            latencies.append(time.perf_counter() - start)
+
+    async def uploader():
+        for _ in range(args.uploads // args.upload_concurrency):
+            await upload(s3_service, body)
+
+    readers = [asyncio.create_task(reader(i)) for i in range(args.readers)]
+    start = time.perf_counter()
+    await asyncio.gather(*(uploader() for _ in range(args.upload_concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*readers)
+    await db.close()
+
+    latencies.sort()
+    return (args.uploads / elapsed, len(latencies) / elapsed, statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99) - 1], latencies[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--read-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    with mock_aws():
+        s3_service = importlib.import_module(f"{os.path.basename(ROOT)}.utils.s3_service")
+        s3_service.S3_REGION = "us-east-1"  # placeholder region in the module config
+        s3_service.get_s3_client().create_bucket(Bucket=s3_service.S3_BUCKET_NAME)
+
+        print(f"{'upload path':<12}{'uploads/s':>10}{'reads/s':>10}{'read p50 ms':>13}"
+              f"{'read p99 ms':>13}{'read max ms':>13}")
+        for name, upload in (("blocking", blocking_upload), ("off-loop", offloop_upload)):
+            uploads, reads, p50, p99, worst = asyncio.run(run(upload, s3_service, args))
+            print(f"{name:<12}{uploads:>10.1f}{reads:>10.1f}{p50 * 1000:>13.2f}{p99 * 1000:>13.2f}"
+                  f"{worst * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,49 @@
-from s3_database import S3Database
+from s3_backends import LocalBackend, MemoryBackend
+from s3_database import S3Cache, S3Database
+from s3_disk_cache import DiskCache, TieredCache
+from s3_layouts import HashShardLayout
+from s3_segments import SegmentStore
 import os
 
 # Konfiguracja AWS
 BUCKET_NAME = os.environ.get('AWS_BUCKET_NAME', 'twoja-nazwa-bucketu')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 
+# Magazyn danych: s3 (domyślnie), memory lub local (katalog STORAGE_PATH)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 's3')
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '.storage')
+
+
+def create_backend(kind=STORAGE_BACKEND, path=STORAGE_PATH):
+    """Utwórz magazyn danych; None oznacza bucket S3"""
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'local':
+        return LocalBackend(path)
+    return None
+
+
+# Indeksy pomocnicze (wyszukiwanie użytkownika po e-mailu / nazwie)
+INDEXES = {
+    "users": ["email", "username"],
+}
+
+# Rozkład kluczy: S3_SHARDED_COLLECTIONS="users" rozprasza rekordy po prefiksach users/<hash>/
+SHARDED_COLLECTIONS = [c for c in os.environ.get('S3_SHARDED_COLLECTIONS', '').split(',') if c]
+LAYOUT = HashShardLayout(SHARDED_COLLECTIONS) if SHARDED_COLLECTIONS else None
+
+# Segmenty: S3_PACKED_COLLECTIONS="users" pakuje małe rekordy w duże obiekty (manage.py compact)
+PACKED_COLLECTIONS = [c for c in os.environ.get('S3_PACKED_COLLECTIONS', '').split(',') if c]
+SEGMENTS = SegmentStore(PACKED_COLLECTIONS) if PACKED_COLLECTIONS else None
+
+# Pamięć podręczna: S3_CACHE_DIR włącza drugi poziom na dysku, wspólny dla procesów na hoście
+CACHE_DIR = os.environ.get('S3_CACHE_DIR')
+CACHE_MAX_BYTES = int(os.environ.get('S3_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+CACHE = TieredCache(S3Cache(), DiskCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES)) if CACHE_DIR else None
+
 # Inicjalizacja bazy danych S3
-db = S3Database(bucket_name=BUCKET_NAME, region_name=AWS_REGION)
+db = S3Database(bucket_name=BUCKET_NAME, region_name=AWS_REGION, cache=CACHE, indexes=INDEXES, layout=LAYOUT,
+                backend=create_backend(), segments=SEGMENTS)
 
 
 
@@ -20,6 +57,22 @@ def get_user(user_id):
     return db.load_data(f"users/{user_id}")
 
 
+def get_users(user_ids):
+    """Pobierz dane wielu użytkowników z S3 równolegle"""
+    results = db.load_many([f"users/{user_id}" for user_id in user_ids])
+    return {
+        user_id: results[f"users/{user_id}"].value
+        for user_id in user_ids
+        if results[f"users/{user_id}"].ok
+    }
+
+
+def find_user_by_email(email):
+    """Znajdź użytkownika po adresie e-mail (bez przeglądania wszystkich rekordów)"""
+    found = db.find_by("users.email", email)
+    return found[1] if found else None
+
+
 def delete_user(user_id):
     """Usuń dane użytkownika z S3"""
     db.delete_data(f"users/{user_id}")
@@ -30,6 +83,18 @@ def list_users():
     return db.list_keys(prefix="users/")
 
 
+def iter_all_users():
+    """Przeglądaj wszystkich użytkowników strumieniowo (równoległe pobieranie)"""
+    for key, user_data in db.iter_items(prefix="users/"):
+        yield key[len("users/"):], user_data
+
+
+def list_users_page(cursor=None, page_size=100):
+    """Wyświetl jedną stronę użytkowników (paginacja kursorem)"""
+    page = db.list_page(prefix="users/", page_size=page_size, cursor=cursor)
+    return page["keys"], page["cursor"]
+
+
 
 # Przykład użycia:
 if __name__ == "__main__":
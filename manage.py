@@ -0,0 +1,74 @@
+"""
+Maintenance commands for the S3 database
+
+Usage:
+    python manage.py rebuild-indexes users
+    S3_SHARDED_COLLECTIONS=users python manage.py migrate-layout --from flat
+    S3_PACKED_COLLECTIONS=users python manage.py compact users
+"""
+import argparse
+
+from main import db
+from s3_layouts import FlatLayout, HashShardLayout
+
+
+def rebuild_indexes(args):
+    """Rebuild secondary index pointers from existing records"""
+    collections = args.collections or list(db.indexes)
+    for collection in collections:
+        result = db.rebuild_indexes(collection)
+        print(
+            f"{collection}: scanned {result['records']} records, "
+            f"wrote {result['pointers']} pointers, removed {result['removed']} stale pointers"
+        )
+
+
+def migrate_layout(args):
+    """Re-key existing objects into the configured key layout"""
+    if args.source == "flat":
+        source = FlatLayout()
+    else:
+        source = HashShardLayout(args.collections, width=args.width)
+
+    print(f"Migrating {source!r} -> {db.layout!r}")
+    result = db.migrate_layout(source, prefix=args.prefix)
+    print(f"scanned {result['scanned']} objects, moved {result['moved']}, failed {result['failed']}")
+
+
+def compact(args):
+    """Fold standalone records of packed collections into segments"""
+    collections = args.collections or sorted(db.segments.collections if db.segments else [])
+    for collection in collections:
+        result = db.compact(collection)
+        print(
+            f"{collection}: packed {result['records']} records into {result['segments']} segments, "
+            f"folded {result['folded']} objects and {result['tombstones']} tombstones"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-indexes", help=rebuild_indexes.__doc__)
+    rebuild.add_argument("collections", nargs="*", help="Collections to rebuild (default: all indexed)")
+    rebuild.set_defaults(func=rebuild_indexes)
+
+    migrate = subparsers.add_parser("migrate-layout", help=migrate_layout.__doc__)
+    migrate.add_argument("--from", dest="source", choices=["flat", "sharded"], default="flat",
+                         help="Layout the existing objects were written with")
+    migrate.add_argument("--collections", nargs="*", default=[], help="Sharded collections of the source layout")
+    migrate.add_argument("--width", type=int, default=2, help="Shard width of the source layout")
+    migrate.add_argument("--prefix", default="", help="Only migrate objects under this prefix")
+    migrate.set_defaults(func=migrate_layout)
+
+    packer = subparsers.add_parser("compact", help=compact.__doc__)
+    packer.add_argument("collections", nargs="*", help="Collections to compact (default: all packed)")
+    packer.set_defaults(func=compact)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
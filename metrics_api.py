@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from s3_metrics import METRICS, PrometheusExporter
+
+router = APIRouter(tags=["metrics"])
+
+exporter = PrometheusExporter(METRICS)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Storage call metrics in the Prometheus text format"""
+    return PlainTextResponse(exporter.render(), media_type="text/plain; version=0.0.4")
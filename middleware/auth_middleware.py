@@ -1,11 +1,76 @@
 # middleware/auth_middleware.py
-from fastapi import Request, HTTPException
+from fastapi import Request
 import jwt
 import requests
 import json
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import random
+import threading
 import time
+from collections import OrderedDict
+
+# Keys are refreshed in the background this often (minus up to 10% jitter)
+JWKS_REFRESH_INTERVAL = 3600
+
+# After a failed refresh the last good keys stay in use and the fetch is retried sooner
+JWKS_RETRY_INTERVAL = 60
+
+# A token with an unknown key ID triggers a refresh at most this often
+JWKS_UNKNOWN_KID_COOLDOWN = 30
+
+# Longest a request waits for a refresh it triggered
+JWKS_WAIT_TIMEOUT = 3
+
+# Tokens whose signature was already checked, kept until they expire
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = VERIFIED_TOKEN_CACHE_SIZE):
+        """
+        Bounded LRU from token digest to its verified claims
+
+        A client reuses one access token for hundreds of requests; after the
+        first RS256 verification the claims are served from here until the
+        token's exp. Entries are keyed by SHA-256, so tokens aren't kept.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> claims
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a previously verified token that hasn't expired, or None"""
+        digest = self._digest(token)
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        if self.max_entries <= 0 or not isinstance(claims.get("exp"), (int, float)):
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = claims
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
 
 class CognitoAuthMiddleware(BaseHTTPMiddleware):
@@ -18,33 +83,93 @@ class CognitoAuthMiddleware(BaseHTTPMiddleware):
         # Public keys URL
         self.jwks_url = f"https://cognito-idp.{self.cognito_region}.amazonaws.com/{self.cognito_user_pool_id}/.well-known/jwks.json"
 
-        # Load and cache the public keys
-        self.jwks = self._get_jwks()
-        self.last_jwks_load = time.time()
+        # Public keys by key ID, parsed once per load and kept fresh by a
+        # background task started on the first request
+        self.jwks = None
+        self.last_jwks_load = 0
+        self.last_kid_refresh = 0
+        self._refresh_task = None
+        self._refresher = None
+
+        self.verified_tokens = VerifiedTokenCache()
 
     def _get_jwks(self) -> Dict[str, Any]:
-        """Get the JSON Web Key Set from Cognito"""
+        """Get the JSON Web Key Set from Cognito (blocking; runs on a worker thread)"""
+        response = requests.get(self.jwks_url, timeout=5)
+        response.raise_for_status()
+        jwks = json.loads(response.text)
+        if not jwks.get("keys"):
+            raise ValueError("JWKS contains no keys")
+        return jwks
+
+    async def _load_jwks(self) -> bool:
+        """Fetch the JWKS off the event loop; on failure the last good keys stay in use"""
         try:
-            response = requests.get(self.jwks_url)
-            return json.loads(response.text)
+            jwks = await asyncio.get_running_loop().run_in_executor(None, self._get_jwks)
         except Exception as e:
             print(f"Error loading JWKS: {str(e)}")
-            return {"keys": []}
-
-    def _get_public_key(self, kid: str) -> str:
-        """Get the public key matching the key ID from the JWKS"""
-        # Reload JWKS if it's been more than an hour
-        if time.time() - self.last_jwks_load > 3600:
-            self.jwks = self._get_jwks()
-            self.last_jwks_load = time.time()
-
-        for key in self.jwks.get("keys", []):
-            if key.get("kid") == kid:
-                # Convert JWK to PEM format - this is a simplified version
-                # In a real implementation, you'd use a library like python-jose
-                # to properly convert the JWK to PEM
-                return key
-        return None
+            return False
+
+        keys = {}
+        for jwk in jwks["keys"]:
+            try:
+                # Convert each JWK to a ready-to-use key object once, not on every request
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except Exception as e:
+                print(f"Skipping JWK {jwk.get('kid')}: {str(e)}")
+
+        # Tokens signed with a key that was withdrawn must be verified again
+        if self.jwks is not None and not set(self.jwks) <= set(keys):
+            self.verified_tokens.clear()
+
+        self.jwks = keys
+        self.last_jwks_load = time.time()
+        return True
+
+    def _refresh_jwks(self) -> asyncio.Task:
+        """Start a JWKS fetch unless one is running; concurrent callers share it"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._load_jwks())
+        return self._refresh_task
+
+    async def _refresh_periodically(self):
+        """Background loop keeping the keys fresh, so requests never wait for Cognito"""
+        while True:
+            loaded = await self._refresh_jwks()
+            interval = JWKS_REFRESH_INTERVAL if loaded else JWKS_RETRY_INTERVAL
+            # Jitter keeps the workers of a deployment from refreshing at the same moment
+            await asyncio.sleep(interval * random.uniform(0.9, 1.0))
+
+    def _start_refresher(self):
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_periodically())
+
+    async def _get_public_key(self, kid: str):
+        """
+        Get the public key matching the key ID from the JWKS
+
+        Known keys are served from memory. Before the first load, or for a
+        key ID that isn't known yet (Cognito rotated its keys), the request
+        waits briefly for a shared background refresh. Requests start a new
+        refresh at most every JWKS_UNKNOWN_KID_COOLDOWN seconds, so forged
+        tokens or an unreachable Cognito don't turn into a fetch per request.
+        """
+        self._start_refresher()
+
+        key = self.jwks.get(kid) if self.jwks else None
+        if key is not None:
+            return key
+
+        if self._refresh_task is None or self._refresh_task.done():
+            if time.time() - self.last_kid_refresh < JWKS_UNKNOWN_KID_COOLDOWN:
+                return None
+            self.last_kid_refresh = time.time()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self._refresh_jwks()), JWKS_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        return self.jwks.get(kid) if self.jwks else None
 
     async def dispatch(self, request: Request, call_next):
         # List of paths that don't need authentication
@@ -75,26 +200,28 @@ class CognitoAuthMiddleware(BaseHTTPMiddleware):
                 request.state.user_id = None
                 return await call_next(request)
 
-            # Get the key ID from the token header
-            token_header = jwt.get_unverified_header(token)
-            kid = token_header.get("kid")
-
-            # Get the public key
-            public_key = self._get_public_key(kid)
-            if not public_key:
-                request.state.user_id = None
-                return await call_next(request)
-
-            # Verify the token
-            # In a real implementation, you'd use the python-jose library
-            # to properly verify the JWT signature with the JWK
-            payload = jwt.decode(
-                token,
-                public_key,
-                algorithms=["RS256"],
-                audience=self.cognito_app_client_id,
-                options={"verify_exp": True}
-            )
+            # A token verified before is only looked up again
+            payload = self.verified_tokens.get(token)
+            if payload is None:
+                # Get the key ID from the token header
+                token_header = jwt.get_unverified_header(token)
+                kid = token_header.get("kid")
+
+                # Get the public key
+                public_key = await self._get_public_key(kid)
+                if not public_key:
+                    request.state.user_id = None
+                    return await call_next(request)
+
+                # Verify the token
+                payload = jwt.decode(
+                    token,
+                    public_key,
+                    algorithms=["RS256"],
+                    audience=self.cognito_app_client_id,
+                    options={"verify_exp": True}
+                )
+                self.verified_tokens.put(token, payload)
 
             # Set user info in request state
             request.state.user_id = payload.get("sub")  # This is the Cognito user ID
@@ -0,0 +1,414 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client
+from s3_metrics import instrument_client
+
+# Returned by StorageBackend.get when the object still matches if_none_match
+NOT_MODIFIED = object()
+
+# Paginated LocalBackend listings whose sorted keys are kept for the next page
+LOCAL_LIST_SCANS = 8
+
+
+@dataclass
+class StoredObject:
+    """An object as returned by StorageBackend.get"""
+    body: bytes
+    etag: Optional[str] = None
+    metadata: Dict[str, str] = field(default_factory=dict)
+    content_encoding: Optional[str] = None
+
+
+class StorageBackend:
+    """
+    Object storage used by S3Database
+
+    Implementations share S3 semantics: flat keys, whole-object writes,
+    ETags for conditional reads and lexicographically ordered listings.
+    """
+
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        """
+        Store an object, replacing any existing one
+
+        Returns:
+            str: ETag of the stored object
+        """
+        raise NotImplementedError
+
+    def get(self, key, if_none_match=None):
+        """
+        Fetch an object
+
+        Returns:
+            StoredObject, None if the key doesn't exist, or NOT_MODIFIED if
+            its ETag equals if_none_match
+        """
+        raise NotImplementedError
+
+    def get_range(self, key, start, length):
+        """
+        Fetch length bytes of an object starting at offset start
+
+        Returns:
+            bytes, or None if the key doesn't exist
+        """
+        obj = self.get(key)
+        if obj is None:
+            return None
+        return obj.body[start:start + length]
+
+    def delete(self, key):
+        """Delete an object; deleting a missing key is not an error"""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        """
+        Delete several objects in one request where the backend supports it
+
+        Returns:
+            dict: key -> Exception for keys that could not be deleted
+        """
+        errors = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as e:
+                errors[key] = e
+        return errors
+
+    def list(self, prefix, max_keys=1000, token=None, start_after=None, delimiter=None):
+        """
+        List one page of object keys
+
+        Returns:
+            tuple: (keys, common prefixes, continuation token or None)
+        """
+        raise NotImplementedError
+
+    def copy(self, source, target):
+        """Copy an object to a new key, keeping its metadata"""
+        obj = self.get(source)
+        if obj is None:
+            raise KeyError(source)
+        self.put(target, obj.body, metadata=obj.metadata, content_encoding=obj.content_encoding)
+
+
+def _etag(body):
+    """S3-style ETag (quoted MD5) of a single-part object"""
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _list_sorted(keys, prefix, max_keys, token=None, start_after=None, delimiter=None):
+    """
+    ListObjectsV2 semantics over an already sorted list of keys
+
+    The continuation token is the last key or common prefix returned.
+    """
+    marker = token or start_after or ""
+    start = bisect.bisect_right(keys, marker) if marker else bisect.bisect_left(keys, prefix)
+
+    page, prefixes, last = [], [], None
+    for key in keys[start:]:
+        if not key.startswith(prefix):
+            if key > prefix:
+                break
+            continue
+        if delimiter and token and token.endswith(delimiter) and key.startswith(token):
+            continue  # rest of the common prefix the previous page ended on
+        if len(page) + len(prefixes) >= max_keys:
+            return page, prefixes, last
+
+        if delimiter:
+            cut = key.find(delimiter, len(prefix))
+            if cut != -1:
+                common = key[:cut + len(delimiter)]
+                if common != last:
+                    prefixes.append(common)
+                    last = common
+                continue
+        page.append(key)
+        last = key
+
+    return page, prefixes, None
+
+
+class S3Backend(StorageBackend):
+    def __init__(self, bucket_name, region_name='us-east-1', max_pool_connections=10):
+        """
+        Amazon S3 storage
+
+        Construction does no I/O: the shared client is fetched and the
+        bucket checked (and created if missing) once, on first use.
+
+        Args:
+            bucket_name (str): AWS S3 bucket name to use for storage
+            region_name (str): AWS region name
+            max_pool_connections (int): Size of the botocore connection pool
+        """
+        self.bucket_name = bucket_name
+        self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """botocore S3 client, connected to a bucket known to exist"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    client = instrument_client(get_client('s3', self.region_name, self.max_pool_connections))
+                    # Create bucket if it doesn't exist
+                    try:
+                        client.head_bucket(Bucket=self.bucket_name)
+                    except ClientError:
+                        # Bucket doesn't exist or you don't have access
+                        client.create_bucket(Bucket=self.bucket_name)
+                    self._client = client
+        return self._client
+
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        params = {'Bucket': self.bucket_name, 'Key': key, 'Body': body}
+        if content_type:
+            params['ContentType'] = content_type
+        if metadata:
+            params['Metadata'] = metadata
+        if content_encoding:
+            params['ContentEncoding'] = content_encoding
+        return self.client.put_object(**params).get('ETag')
+
+    def get(self, key, if_none_match=None):
+        params = {'Bucket': self.bucket_name, 'Key': key}
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+
+        try:
+            response = self.client.get_object(**params)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in ('304', 'NotModified'):
+                return NOT_MODIFIED
+            if code == 'NoSuchKey':
+                return None
+            raise
+
+        return StoredObject(
+            body=response['Body'].read(),
+            etag=response.get('ETag'),
+            metadata=response.get('Metadata') or {},
+            content_encoding=response.get('ContentEncoding')
+        )
+
+    def get_range(self, key, start, length):
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Range=f"bytes={start}-{start + length - 1}"
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise
+        return response['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket_name, Key=key)
+
+    def delete_many(self, keys):
+        try:
+            response = self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    'Objects': [{'Key': key} for key in keys],
+                    'Quiet': True
+                }
+            )
+        except ClientError as e:
+            return {key: e for key in keys}
+
+        return {
+            error['Key']: ClientError({'Error': error}, 'DeleteObjects')
+            for error in response.get('Errors', [])
+        }
+
+    def list(self, prefix, max_keys=1000, token=None, start_after=None, delimiter=None):
+        params = {
+            'Bucket': self.bucket_name,
+            'Prefix': prefix,
+            'MaxKeys': max_keys
+        }
+        if token:
+            params['ContinuationToken'] = token
+        elif start_after:
+            params['StartAfter'] = start_after
+        if delimiter:
+            params['Delimiter'] = delimiter
+
+        response = self.client.list_objects_v2(**params)
+
+        keys = [obj['Key'] for obj in response.get('Contents', [])]
+        prefixes = [p['Prefix'] for p in response.get('CommonPrefixes', [])]
+        token = response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        return keys, prefixes, token
+
+    def copy(self, source, target):
+        self.client.copy_object(
+            Bucket=self.bucket_name,
+            Key=target,
+            CopySource={'Bucket': self.bucket_name, 'Key': source}
+        )
+
+
+class MemoryBackend(StorageBackend):
+    def __init__(self):
+        """In-process storage for tests, benchmarks and local development"""
+        self._objects = {}  # key -> StoredObject
+        self._keys = []     # sorted keys, for listing
+        self._lock = threading.Lock()
+
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        body = bytes(body.encode() if isinstance(body, str) else body)
+        obj = StoredObject(body, _etag(body), dict(metadata or {}), content_encoding)
+        with self._lock:
+            if key not in self._objects:
+                bisect.insort(self._keys, key)
+            self._objects[key] = obj
+        return obj.etag
+
+    def get(self, key, if_none_match=None):
+        with self._lock:
+            obj = self._objects.get(key)
+        if obj is None:
+            return None
+        if if_none_match and if_none_match == obj.etag:
+            return NOT_MODIFIED
+        return obj
+
+    def delete(self, key):
+        with self._lock:
+            if self._objects.pop(key, None) is not None:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def list(self, prefix, max_keys=1000, token=None, start_after=None, delimiter=None):
+        with self._lock:
+            return _list_sorted(self._keys, prefix, max_keys, token, start_after, delimiter)
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root):
+        """
+        Storage in a local directory, one file per object
+
+        Each file holds a one-line JSON header (ETag, metadata, encoding)
+        followed by the body. Writes go to a temporary file that is renamed
+        into place, so readers never observe partial objects.
+
+        A paginated listing walks the directory tree once: later pages reuse
+        the sorted keys of the first one, so like an S3 listing they may or
+        may not reflect objects written or deleted during the scan.
+
+        Args:
+            root (str): Directory to store objects in (created if missing)
+        """
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._scans = OrderedDict()  # (prefix, delimiter, next token) -> sorted keys
+        self._scans_lock = threading.Lock()
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        body = body.encode() if isinstance(body, str) else bytes(body)
+        etag = _etag(body)
+        header = json.dumps({
+            "etag": etag,
+            "metadata": metadata or {},
+            "content_encoding": content_encoding
+        }).encode()
+
+        path = self._path(key)
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(header + b"\n" + body)
+        os.replace(tmp, path)
+        return etag
+
+    def get(self, key, if_none_match=None):
+        try:
+            with open(self._path(key), "rb") as f:
+                header = json.loads(f.readline())
+                if if_none_match and if_none_match == header["etag"]:
+                    return NOT_MODIFIED
+                body = f.read()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+
+        return StoredObject(body, header["etag"], header["metadata"], header["content_encoding"])
+
+    def get_range(self, key, start, length):
+        try:
+            with open(self._path(key), "rb") as f:
+                f.readline()  # skip header
+                f.seek(start, os.SEEK_CUR)
+                return f.read(length)
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix, max_keys=1000, token=None, start_after=None, delimiter=None):
+        keys = None
+        if token is not None:
+            with self._scans_lock:
+                keys = self._scans.pop((prefix, delimiter, token), None)
+        if keys is None:
+            keys = self._walk(prefix)
+
+        page, prefixes, next_token = _list_sorted(keys, prefix, max_keys, token, start_after, delimiter)
+        if next_token is not None:
+            with self._scans_lock:
+                self._scans[(prefix, delimiter, next_token)] = keys
+                while len(self._scans) > LOCAL_LIST_SCANS:
+                    self._scans.popitem(last=False)
+        return page, prefixes, next_token
+
+    def _walk(self, prefix):
+        """Sorted keys of all objects starting with prefix"""
+        # Only walk the deepest directory the prefix pins down
+        base = prefix.rpartition("/")[0]
+        top = os.path.join(self.root, *base.split("/")) if base else self.root
+
+        keys = []
+        for directory, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            rel = os.path.relpath(directory, self.root).replace(os.sep, "/")
+            for name in files:
+                if name.startswith("."):
+                    continue  # in-flight temporary file
+                key = name if rel == "." else f"{rel}/{name}"
+                if key.startswith(prefix):
+                    keys.append(key)
+        keys.sort()
+        return keys
@@ -0,0 +1,172 @@
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional fast JSON encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary format
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional compression
+    zstandard = None
+
+# Object metadata entry recording the serialization format of a payload
+CODEC_METADATA_KEY = "codec"
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "orjson": "application/json",
+    "msgpack": "application/msgpack",
+}
+
+
+def _json_dumps(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _json_loads(body):
+    return json.loads(body)
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _orjson_loads(body):
+    # orjson payloads are plain JSON, readable without the optional package
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+
+def _msgpack_dumps(data):
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def _msgpack_loads(body):
+    if msgpack is None:
+        raise RuntimeError("Decoding msgpack objects requires the 'msgpack' package")
+    return msgpack.unpackb(body, raw=False)
+
+
+def _zstd_compress(body, level):
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+def _zstd_decompress(body):
+    if zstandard is None:
+        raise RuntimeError("Decoding zstd objects requires the 'zstandard' package")
+    return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+SERIALIZERS = {
+    "json": (_json_dumps, _json_loads),
+    "orjson": (_orjson_dumps, _orjson_loads),
+    "msgpack": (_msgpack_dumps, _msgpack_loads),
+}
+
+COMPRESSORS = {
+    "gzip": (lambda body, level: gzip.compress(body, compresslevel=level), gzip.decompress),
+    "zstd": (_zstd_compress, _zstd_decompress),
+}
+
+DEFAULT_LEVELS = {
+    "gzip": 6,
+    "zstd": 3,
+}
+
+
+class Codec:
+    def __init__(self, format="json", compression=None, level=None):
+        """
+        Serialization and compression settings for S3Database payloads
+
+        The format is recorded in object metadata and the compression in
+        Content-Encoding, so objects written with any codec (including plain
+        json.dumps objects written before codecs existed) decode correctly.
+
+        Args:
+            format (str): "json" (stdlib), "orjson" or "msgpack"; orjson
+                is faster but rejects integers beyond 64 bits and writes
+                NaN and infinity as null, so it is opt-in
+            compression (str): None, "gzip" or "zstd"
+            level (int): Compression level, defaults per algorithm
+        """
+        if format not in SERIALIZERS:
+            raise ValueError(f"Unknown codec format: {format}")
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if format == "orjson" and orjson is None:
+            raise RuntimeError("orjson codec requires the 'orjson' package")
+        if format == "msgpack" and msgpack is None:
+            raise RuntimeError("msgpack codec requires the 'msgpack' package")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+
+        self.format = format
+        self.compression = compression
+        self.level = level if level is not None else DEFAULT_LEVELS.get(compression)
+
+    @property
+    def name(self):
+        if self.compression:
+            return f"{self.format}+{self.compression}"
+        return self.format
+
+    def encode(self, data):
+        """
+        Encode a record for storage
+
+        Returns:
+            tuple: (body bytes, put_object arguments describing the encoding)
+        """
+        body = SERIALIZERS[self.format][0](data)
+
+        put_args = {
+            "ContentType": CONTENT_TYPES[self.format],
+            "Metadata": {CODEC_METADATA_KEY: self.format},
+        }
+        if self.compression:
+            body = COMPRESSORS[self.compression][0](body, self.level)
+            put_args["ContentEncoding"] = self.compression
+
+        return body, put_args
+
+    def __repr__(self):
+        return f"Codec({self.name!r})"
+
+
+def decode(body, metadata=None, content_encoding=None):
+    """
+    Decode a stored payload using the encoding recorded on the object
+
+    Args:
+        body (bytes): Raw object body
+        metadata (dict): Object user metadata
+        content_encoding (str): Object Content-Encoding header
+
+    Returns:
+        Decoded record
+    """
+    if content_encoding and content_encoding != "identity":
+        if content_encoding not in COMPRESSORS:
+            raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+        body = COMPRESSORS[content_encoding][1](body)
+
+    format = (metadata or {}).get(CODEC_METADATA_KEY, "json")
+    if format not in SERIALIZERS:
+        raise ValueError(f"Unsupported codec: {format}")
+    return SERIALIZERS[format][1](body)
+
+
+def available_codecs():
+    """Codecs usable with the packages installed in this environment"""
+    formats = ["json"] + (["orjson"] if orjson is not None else []) + (["msgpack"] if msgpack is not None else [])
+    compressions = [None, "gzip"] + (["zstd"] if zstandard is not None else [])
+    return [Codec(f, c) for f in formats for c in compressions]
@@ -1,27 +1,317 @@
-import boto3
+import atexit
+import base64
+import copy
+import heapq
 import json
 import os
-from botocore.exceptions import ClientError
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import quote
+from s3_backends import NOT_MODIFIED, S3Backend
+from s3_codecs import Codec, decode
+from s3_layouts import FlatLayout
+from s3_segments import SEGMENT_PREFIX
+
+# S3 DeleteObjects accepts at most this many keys per request
+DELETE_BATCH_SIZE = 1000
+
+# Secondary index pointer objects live under this top-level prefix
+INDEX_PREFIX = "idx"
+
+
+class UniqueIndexError(ValueError):
+    """A save would give an indexed value to a second record"""
+
+
+@dataclass
+class BulkResult:
+    """Outcome of one key in a load_many / save_many / delete_many call"""
+    key: str
+    ok: bool
+    value: Any = None
+    error: Optional[Exception] = None
+
+
+class S3Cache:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=30):
+        """
+        In-process LRU cache for records loaded by S3Database
+
+        Entries are keyed by record key and remember the ETag they were
+        fetched with, so stale entries can be revalidated with a conditional
+        GET instead of being downloaded and decoded again.
+
+        Args:
+            max_entries (int): Maximum number of cached records
+            max_bytes (int): Maximum total size of cached records (encoded size)
+            ttl (float): Seconds an entry is served without revalidation
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key -> (data, etag, size, expires_at), least recently used first
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look up a cached entry, fresh or stale
+
+        Returns:
+            tuple: (data, etag, is_fresh), or None if the key is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            data, etag, _, expires_at = entry
+            return data, etag, time.monotonic() < expires_at
+
+    def put(self, key, data, etag, size):
+        """Store a record, evicting least recently used entries to stay within limits"""
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+
+            self._entries[key] = (data, etag, size, time.monotonic() + self.ttl)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[2]
+                self.evictions += 1
+
+    def record(self, counter):
+        """Increment one of the hits/misses/revalidations counters"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def refresh(self, key):
+        """Extend the lifetime of an entry after a successful revalidation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, etag, size, _ = entry
+                self._entries[key] = (data, etag, size, time.monotonic() + self.ttl)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[2]
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Cache counters
+
+        Returns:
+            dict: hits, misses, revalidations, evictions, entries and bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+
+class WriteBuffer:
+    def __init__(self, max_pending=1000, flush_interval=1.0):
+        """
+        Write-behind buffer for S3Database.save_data
+
+        Writes are held in memory keyed by record key, so repeated writes to
+        the same record within a flush window coalesce into a single PUT of
+        the latest value. A background worker flushes the buffer every
+        flush_interval seconds or as soon as max_pending records are queued.
+
+        Args:
+            max_pending (int): Number of buffered records that triggers a flush
+            flush_interval (float): Maximum seconds a write stays buffered
+        """
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.flush_needed = threading.Event()
+
+        self._pending = {}   # key -> data waiting for the next flush
+        self._flushing = {}  # key -> data currently being written
+        self._lock = threading.Lock()
+
+        self.writes = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def put(self, key, data):
+        """Buffer a write, replacing any pending write for the same key"""
+        with self._lock:
+            self.writes += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = data
+            if len(self._pending) >= self.max_pending:
+                self.flush_needed.set()
+
+    def get(self, key):
+        """
+        Look up a buffered value
+
+        Returns:
+            tuple: (True, data) if the key has a buffered write, else (False, None)
+        """
+        with self._lock:
+            if key in self._pending:
+                return True, self._pending[key]
+            if key in self._flushing:
+                return True, self._flushing[key]
+            return False, None
+
+    def items(self, prefix=""):
+        """
+        Snapshot of buffered writes under a key prefix
+
+        Returns:
+            dict: key -> data, pending writes taking precedence over in-flight ones
+        """
+        with self._lock:
+            items = {key: data for key, data in self._flushing.items() if key.startswith(prefix)}
+            items.update((key, data) for key, data in self._pending.items() if key.startswith(prefix))
+            return items
+
+    def discard(self, key):
+        """Drop a pending write that has not started flushing"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def drain(self):
+        """Move all pending writes to the in-flight set and return them"""
+        with self._lock:
+            items, self._pending = self._pending, {}
+            self._flushing.update(items)
+            return items
+
+    def done(self, key, ok, retry=True):
+        """Mark an in-flight write finished; failed writes are requeued unless superseded or retry is False"""
+        with self._lock:
+            data = self._flushing.pop(key, None)
+            if ok:
+                self.flushed += 1
+            else:
+                self.failed += 1
+                if retry:
+                    self._pending.setdefault(key, data)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        """
+        Write-behind counters
+
+        Returns:
+            dict: writes accepted, coalesced, PUTs flushed, failed, pending,
+            and coalescing_ratio (writes per PUT issued)
+        """
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "pending": len(self._pending),
+                "coalescing_ratio": self.writes / self.flushed if self.flushed else None,
+            }
 
 
 class S3Database:
-    def __init__(self, bucket_name, region_name='us-east-1'):
+    def __init__(self, bucket_name, region_name='us-east-1', cache=None, max_pool_connections=10,
+                 codec=None, indexes=None, write_buffer=None, layout=None, backend=None, segments=None):
         """
         Initialize S3 database connection
 
         Args:
             bucket_name (str): AWS S3 bucket name to use for storage
             region_name (str): AWS region name
+            cache (S3Cache): Optional read-through cache for load_data, or a
+                TieredCache adding a local disk tier shared across processes
+            max_pool_connections (int): Size of the botocore connection pool,
+                also used as the worker count for bulk operations
+            codec (Codec): Payload encoding for new writes (default: JSON);
+                reads always decode using the encoding stored on the object
+            indexes (dict): Unique secondary indexes per collection, e.g.
+                {"users": ["email", "username"]}; the collection is the first
+                segment of the record key
+            write_buffer (WriteBuffer): Opt-in write-behind mode; save_data
+                returns once the write is buffered and reads see buffered values
+            layout: Key layout mapping record keys to object keys, e.g.
+                HashShardLayout(["users"]) (default: FlatLayout)
+            backend (StorageBackend): Object storage to use instead of the
+                S3 bucket, e.g. MemoryBackend() or LocalBackend(path)
+            segments (SegmentStore): Packs small records of selected
+                collections into large segment objects on compaction
         """
-        self.s3 = boto3.resource('s3', region_name=region_name)
+        if backend is None:
+            backend = S3Backend(bucket_name, region_name=region_name,
+                                max_pool_connections=max_pool_connections)
+        self.backend = backend
         self.bucket_name = bucket_name
+        self.cache = cache
+        self.codec = codec or Codec()
+        self.indexes = indexes or {}
+        self.layout = layout or FlatLayout()
+        self.max_pool_connections = max_pool_connections
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Serializes index pointer claims within the process
+        self._index_lock = threading.RLock()
 
-        # Create bucket if it doesn't exist
-        try:
-            self.s3.meta.client.head_bucket(Bucket=bucket_name)
-        except ClientError:
-            # Bucket doesn't exist or you don't have access
-            self.s3.create_bucket(Bucket=bucket_name)
+        self.write_buffer = write_buffer
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flush_thread = None
+        if write_buffer is not None:
+            self._flush_thread = threading.Thread(target=self._flush_worker, name="s3db-flush", daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.close)
+
+        self.segments = segments
+        self._compact_thread = None
+        if segments is not None:
+            segments.attach(self)
+            if segments.compact_interval:
+                self._compact_thread = threading.Thread(target=self._compact_worker, name="s3db-compact",
+                                                        daemon=True)
+                self._compact_thread.start()
 
     def save_data(self, key, data):
         """
@@ -30,28 +320,140 @@ class S3Database:
         Args:
             key (str): Unique identifier for the data
             data (dict): Data to save
+
+        Raises:
+            UniqueIndexError: if another record already has one of the
+                record's indexed values
         """
-        json_data = json.dumps(data)
-        self.s3.Object(self.bucket_name, f"{key}.json").put(Body=json_data)
+        if self.write_buffer is not None:
+            # Snapshot the value: the caller may keep mutating its dict
+            data = copy.deepcopy(data)
+            fields = self._indexed_fields(key)
+            if not fields:
+                self.write_buffer.put(key, data)
+                return
+            # Reject duplicates of stored and buffered records now; the flush
+            # checks again against records stored by other processes meanwhile
+            with self._index_lock:
+                self._check_unique(key, fields, self.load_data(key), data)
+                self.write_buffer.put(key, data)
+            return
+
+        self._save(key, data)
+
+    def _save(self, key, data):
+        """Write a record to S3 and maintain its index pointers"""
+        fields = self._indexed_fields(key)
+        old = self._load(key) if fields else None
+
+        if not fields or all((old or {}).get(field) == data.get(field) for field in fields):
+            self._put(key, data)
+            return
+
+        # Indexed values change: claim them, write, then move the pointers
+        with self._index_lock:
+            self._check_unique(key, fields, old, data)
+            self._put(key, data)
+            self._update_index_pointers(key, fields, old, data)
+
+    def _put(self, key, data):
+        """Encode and PUT a single record, bypassing index maintenance"""
+        body, put_args = self.codec.encode(data)
+        with self._writing([key]):
+            etag = self.backend.put(
+                self._object_key(key),
+                body,
+                content_type=put_args['ContentType'],
+                metadata=put_args['Metadata'],
+                content_encoding=put_args.get('ContentEncoding')
+            )
+
+            if self.segments is not None:
+                self.segments.record_written(key)
+
+        if self.cache is not None:
+            # Write through with the decoded form so the cache holds exactly
+            # what a later GET would return, not the caller's mutable dict
+            self.cache.put(key, decode(body, put_args['Metadata'], put_args.get('ContentEncoding')),
+                           etag, len(body))
+
+    def _writing(self, keys):
+        """Context manager that keeps writes of keys out of a running compaction"""
+        if self.segments is None:
+            return nullcontext()
+        return self.segments.writing(keys)
 
     def load_data(self, key):
         """
         Load data from S3
 
+        With a cache configured, fresh entries are served from memory and
+        stale ones are revalidated with a conditional GET. Cached and
+        buffered records are returned as copies, so changing the result
+        never touches the cache or a pending write.
+
         Args:
             key (str): Unique identifier for the data
 
         Returns:
             dict: Data loaded from S3, or None if key doesn't exist
         """
-        try:
-            obj = self.s3.Object(self.bucket_name, f"{key}.json")
-            data = json.loads(obj.get()['Body'].read())
-            return data
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
-                return None
-            raise
+        if self.write_buffer is not None:
+            buffered, data = self.write_buffer.get(key)
+            if buffered:
+                return copy.deepcopy(data)
+
+        data = self._load(key)
+        return copy.deepcopy(data) if self.cache is not None else data
+
+    def _load(self, key):
+        """Load a record through the cache, ignoring buffered writes"""
+        if self.cache is None:
+            return self._get(key)[0]
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            data, etag, is_fresh = cached
+            if is_fresh:
+                self.cache.record('hits')
+                return data
+
+            result = self._get(key, if_none_match=etag)
+            if result is None:
+                # 304 Not Modified: keep the cached body, skip transfer and decode
+                self.cache.record('revalidations')
+                self.cache.refresh(key)
+                return data
+        else:
+            result = self._get(key)
+
+        self.cache.record('misses')
+        data, etag, size = result
+        if data is None:
+            self.cache.invalidate(key)
+        else:
+            self.cache.put(key, data, etag, size)
+        return data
+
+    def _get(self, key, if_none_match=None):
+        """
+        GET a record, optionally conditional on its ETag
+
+        Returns:
+            tuple: (data, etag, size), (None, None, 0) if the key doesn't
+            exist, or None if the object still matches if_none_match
+        """
+        obj = self.backend.get(self._object_key(key), if_none_match=if_none_match)
+        if obj is NOT_MODIFIED:
+            return None
+        if obj is None:
+            packed = self.segments.read(key) if self.segments is not None else None
+            if packed is not None:
+                return packed[0], None, packed[1]
+            return None, None, 0
+
+        data = decode(obj.body, obj.metadata, obj.content_encoding)
+        return data, obj.etag, len(obj.body)
 
     def delete_data(self, key):
         """
@@ -60,23 +462,695 @@ class S3Database:
         Args:
             key (str): Unique identifier for the data to delete
         """
-        self.s3.Object(self.bucket_name, f"{key}.json").delete()
+        # Wait for an in-flight flush so it can't resurrect the record; a
+        # failed flush requeues its writes before releasing the lock
+        with self._flush_lock:
+            if self.write_buffer is not None:
+                self.write_buffer.discard(key)
+
+            fields = self._indexed_fields(key)
+            old = self._load(key) if fields else None
+
+            self._delete(key)
+
+            if fields:
+                self._update_index_pointers(key, fields, old, None)
+
+    def _delete(self, key):
+        """DELETE a single record, bypassing index maintenance"""
+        with self._writing([key]):
+            self.backend.delete(self._object_key(key))
+
+            if self.segments is not None:
+                self.segments.record_written(key, deleted=True)
+
+        if self.cache is not None:
+            self.cache.invalidate(key)
+
+    def load_many(self, keys):
+        """
+        Load several records concurrently
+
+        Args:
+            keys (list): Record keys to load
+
+        Returns:
+            dict: key -> BulkResult; value is the loaded data (None if missing)
+        """
+        return self._run_many(self.load_data, [(key,) for key in keys])
+
+    def iter_items(self, prefix="", max_in_flight=None, page_size=1000):
+        """
+        Stream (key, data) for every record with given prefix
+
+        Listing runs ahead in a background thread while a bounded number of
+        GETs are in flight on the bulk pool, so full scans keep the network
+        busy instead of idling between requests. Results are yielded as they
+        arrive (not in key order); at most max_in_flight records plus one
+        listing page are held in memory at a time. Packed segment records
+        are read one segment at a time before standalone records, and their
+        keys are remembered so a record compacted or rewritten mid-scan is
+        yielded only once.
+
+        Args:
+            prefix (str): Optional prefix to filter keys
+            max_in_flight (int): Concurrent GETs (default: max_pool_connections)
+            page_size (int): Keys requested per listing call
+
+        Yields:
+            tuple: (key, data); records deleted mid-scan are skipped
+        """
+        packed = set()
+        if self.segments is not None:
+            for key, data in self.segments.items(prefix):
+                packed.add(key)
+                yield key, data
+
+        max_in_flight = max_in_flight or self.max_pool_connections
+        keys = queue.Queue(maxsize=page_size)
+        stop = threading.Event()
+        done = object()
+
+        def offer(item):
+            # Give up once the consumer is gone instead of blocking on a full queue
+            while not stop.is_set():
+                try:
+                    keys.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for key in self._iter_stored_keys(prefix, page_size=page_size):
+                    if key not in packed and not offer(key):
+                        return
+                offer(done)
+            except Exception as e:
+                offer(e)
+
+        producer = threading.Thread(target=produce, name="s3db-list", daemon=True)
+        producer.start()
+
+        executor = self._get_executor()
+        pending = {}
+        listing = True
+        try:
+            while listing or pending:
+                # Top up in-flight GETs; only block on the listing when idle
+                while listing and len(pending) < max_in_flight:
+                    try:
+                        key = keys.get(block=not pending)
+                    except queue.Empty:
+                        break
+                    if key is done:
+                        listing = False
+                    elif isinstance(key, Exception):
+                        raise key
+                    else:
+                        pending[executor.submit(self.load_data, key)] = key
+
+                if not pending:
+                    continue
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    key = pending.pop(future)
+                    data = future.result()
+                    if data is not None:
+                        yield key, data
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+    def save_many(self, mapping):
+        """
+        Save several records concurrently
+
+        Args:
+            mapping (dict): key -> data to save
+
+        Returns:
+            dict: key -> BulkResult
+        """
+        return self._run_many(self.save_data, list(mapping.items()))
+
+    def delete_many(self, keys):
+        """
+        Delete several records using batched DeleteObjects requests
+
+        Args:
+            keys (list): Record keys to delete
+
+        Returns:
+            dict: key -> BulkResult
+        """
+        keys = list(dict.fromkeys(keys))
+        with self._flush_lock:
+            if self.write_buffer is not None:
+                for key in keys:
+                    self.write_buffer.discard(key)
+            return self._delete_many(keys)
+
+    def _delete_many(self, keys):
+        """Batch delete records and their index pointers"""
+        # Remember indexed values so pointers can be dropped after the delete
+        indexed = [key for key in keys if self._indexed_fields(key)]
+        old_records = self._run_many(self._load, [(key,) for key in indexed]) if indexed else {}
+
+        results = self._delete_objects(keys)
+
+        candidates = {}
+        for key, loaded in old_records.items():
+            if results[key].ok and loaded.ok and loaded.value is not None:
+                for field in self._indexed_fields(key):
+                    if loaded.value.get(field) is not None:
+                        candidates[self._index_key(key, field, loaded.value[field])] = key
+
+        # Only drop pointers that haven't been claimed by another record
+        stale_pointers = [
+            pointer_key for pointer_key, pointer
+            in self._run_many(self._load, [(key,) for key in candidates]).items()
+            if pointer.ok and pointer.value is not None
+            and pointer.value.get("key") == candidates[pointer_key]
+        ]
+        if stale_pointers:
+            self._delete_objects(stale_pointers)
+
+        return results
+
+    def _delete_objects(self, keys):
+        """Delete keys in concurrent DeleteObjects batches, bypassing index maintenance"""
+        batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+
+        results = {}
+        for batch_results in self._get_executor().map(self._delete_batch, batches):
+            results.update(batch_results)
+        return {key: results[key] for key in keys}
+
+    def _delete_batch(self, keys):
+        """Delete up to DELETE_BATCH_SIZE records with a single DeleteObjects call"""
+        if self.cache is not None:
+            for key in keys:
+                self.cache.invalidate(key)
+
+        object_keys = {self._object_key(key): key for key in keys}
+        with self._writing(keys):
+            errors = self.backend.delete_many(list(object_keys))
+
+            if self.segments is not None:
+                for key in keys:
+                    self.segments.record_written(key, deleted=True)
+
+        results = {key: BulkResult(key, True) for key in keys}
+        for object_key, error in errors.items():
+            key = object_keys[object_key]
+            results[key] = BulkResult(key, False, error=error)
+        return results
+
+    def _run_many(self, func, calls):
+        """Run func(*args) for every args tuple on the bulk pool, keyed by args[0]"""
+        futures = [(args[0], self._get_executor().submit(func, *args)) for args in calls]
+
+        results = {}
+        for key, future in futures:
+            try:
+                results[key] = BulkResult(key, True, value=future.result())
+            except Exception as e:
+                results[key] = BulkResult(key, False, error=e)
+        return results
+
+    def _get_executor(self):
+        """Bounded worker pool for bulk operations, sized to the connection pool"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_pool_connections,
+                        thread_name_prefix="s3db"
+                    )
+        return self._executor
+
+    def find_by(self, index, value):
+        """
+        Look up a record through a unique secondary index
+
+        Costs two GETs (pointer, then record) regardless of collection size.
+        Pointers are verified against the record, so a stale pointer left by
+        an interrupted write never returns the wrong record. Buffered writes
+        have no pointer yet and are searched in memory first.
+
+        Args:
+            index (str): Index name as "<collection>.<field>", e.g. "users.email"
+            value: Indexed value to look up
+
+        Returns:
+            tuple: (key, data) of the matching record, or None
+        """
+        collection, _, field = index.partition(".")
+        if field not in self.indexes.get(collection, ()):
+            raise ValueError(f"Unknown index: {index}")
+
+        if self.write_buffer is not None:
+            for key, data in self.write_buffer.items(f"{collection}/").items():
+                if data.get(field) == value:
+                    return key, copy.deepcopy(data)
+
+        pointer = self.load_data(self._index_key(f"{collection}/", field, value))
+        if pointer is None:
+            return None
+
+        data = self.load_data(pointer["key"])
+        if data is None or data.get(field) != value:
+            return None
+        return pointer["key"], data
+
+    def rebuild_indexes(self, collection):
+        """
+        Rebuild all index pointers of a collection from its records
+
+        Writes a pointer for every indexed value and removes pointers whose
+        target no longer carries that value. Can run alongside live writes:
+        pointers held by another record are left alone, and every pointer is
+        re-checked against its record right before it is removed.
+
+        Args:
+            collection (str): Collection name, e.g. "users"
+
+        Returns:
+            dict: Number of records scanned, pointers written and removed
+        """
+        fields = self.indexes.get(collection)
+        if not fields:
+            raise ValueError(f"Collection has no indexes: {collection}")
+
+        expected = set()
+        records = pointers = 0
+        batch = []
+
+        def claim(pointer_key, key, field):
+            # A live save may have given the value to another record since the scan
+            owner = self._index_owner(pointer_key, field)
+            if owner is None:
+                self._put(pointer_key, {"key": key})
+            return owner is None or owner == key
+
+        def flush(batch):
+            claims = {}
+            for key, loaded in self.load_many(batch).items():
+                if not loaded.ok or loaded.value is None:
+                    continue
+                for field in fields:
+                    if loaded.value.get(field) is not None:
+                        claims[self._index_key(key, field, loaded.value[field])] = (key, field)
+            results = self._run_many(claim, [(pointer_key, key, field)
+                                             for pointer_key, (key, field) in claims.items()])
+            expected.update(claims)
+            return sum(1 for result in results.values() if result.ok and result.value)
+
+        for key in self.iter_keys(f"{collection}/"):
+            batch.append(key)
+            records += 1
+            if len(batch) >= DELETE_BATCH_SIZE:
+                pointers += flush(batch)
+                batch = []
+        if batch:
+            pointers += flush(batch)
+
+        candidates = [
+            (key, field) for field in fields
+            for key in self.iter_keys(f"{INDEX_PREFIX}/{collection}/{field}/")
+            if key not in expected
+        ]
+        # Pointers written by live saves after their record was scanned are not stale
+        stale = [
+            pointer_key for pointer_key, owner in self._run_many(self._index_owner, candidates).items()
+            if owner.ok and owner.value is None
+        ]
+        if stale:
+            self._delete_objects(stale)
+
+        return {"records": records, "pointers": pointers, "removed": len(stale)}
+
+    def _indexed_fields(self, key):
+        """Indexed fields of the collection a record key belongs to"""
+        collection, sep, _ = key.partition("/")
+        if not sep:
+            return ()
+        return self.indexes.get(collection, ())
+
+    def _index_key(self, key, field, value):
+        """Pointer key for a record's indexed value: idx/<collection>/<field>/<value>"""
+        collection = key.partition("/")[0]
+        return f"{INDEX_PREFIX}/{collection}/{field}/{quote(str(value), safe='')}"
+
+    def _index_owner(self, pointer_key, field):
+        """Key of the record an index pointer belongs to, or None if the pointer is missing or stale"""
+        pointer = self._load(pointer_key)
+        if pointer is None:
+            return None
+        data = self.load_data(pointer["key"])
+        if data is None or data.get(field) is None:
+            return None
+        if self._index_key(pointer["key"], field, data[field]) != pointer_key:
+            return None
+        return pointer["key"]
+
+    def _check_unique(self, key, fields, old, new):
+        """Raise UniqueIndexError if another stored or buffered record holds one of new's changed indexed values"""
+        buffered = None
+        for field in fields:
+            value = (new or {}).get(field)
+            if value is None or value == (old or {}).get(field):
+                continue
+            # Buffered records have no pointer until they are flushed
+            if buffered is None:
+                buffered = self.write_buffer.items(f"{key.partition('/')[0]}/") if self.write_buffer is not None else {}
+            owner = next((other for other, data in buffered.items() if other != key and data.get(field) == value), None)
+            if owner is None:
+                owner = self._index_owner(self._index_key(key, field, value), field)
+            if owner is not None and owner != key:
+                raise UniqueIndexError(f"{key.partition('/')[0]}.{field} value {value!r} is already used by {owner}")
+
+    def _update_index_pointers(self, key, fields, old, new):
+        """Point new indexed values at key and drop pointers for values it no longer has"""
+        with self._index_lock:
+            for field in fields:
+                old_value = (old or {}).get(field)
+                new_value = (new or {}).get(field)
+                if new_value is not None and new_value != old_value:
+                    self._put(self._index_key(key, field, new_value), {"key": key})
+                if old_value is not None and old_value != new_value:
+                    pointer_key = self._index_key(key, field, old_value)
+                    pointer = self._load(pointer_key)
+                    # Only drop the pointer if another record hasn't claimed the value
+                    if pointer is not None and pointer.get("key") == key:
+                        self._delete(pointer_key)
+
+    def flush(self):
+        """
+        Write all buffered records to S3 now
+
+        Returns:
+            dict: key -> BulkResult for the records written
+        """
+        if self.write_buffer is None:
+            return {}
+
+        with self._flush_lock:
+            items = self.write_buffer.drain()
+            if not items:
+                return {}
+
+            results = self._run_many(self._save, list(items.items()))
+            for key, result in results.items():
+                # A duplicate indexed value fails the same way on every retry
+                duplicate = isinstance(result.error, UniqueIndexError)
+                if duplicate:
+                    print(f"Dropping buffered write to {key}: {str(result.error)}")
+                self.write_buffer.done(key, result.ok, retry=not duplicate)
+            return results
+
+    def _flush_worker(self):
+        """Background loop flushing the write buffer on size or time thresholds"""
+        while not self._closed.is_set():
+            self.write_buffer.flush_needed.wait(self.write_buffer.flush_interval)
+            self.write_buffer.flush_needed.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing S3 write buffer: {str(e)}")
+
+    def compact(self, collection):
+        """
+        Fold standalone records of a packed collection into segments
+
+        Returns:
+            dict: Compaction counters from SegmentStore.compact
+        """
+        if self.segments is None:
+            raise ValueError("Segment storage is not enabled")
+        return self.segments.compact(collection)
+
+    def _compact_worker(self):
+        """Background loop compacting packed collections"""
+        while not self._closed.wait(self.segments.compact_interval):
+            for collection in sorted(self.segments.collections):
+                try:
+                    self.segments.compact(collection)
+                except Exception as e:
+                    print(f"Error compacting {collection}: {str(e)}")
+
+    def close(self):
+        """Flush buffered writes and release worker threads"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+
+        if self.write_buffer is not None:
+            self.write_buffer.flush_needed.set()
+            self._flush_thread.join()
+            self.flush()
+            atexit.unregister(self.close)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def write_buffer_stats(self):
+        """
+        Write-behind counters
+
+        Returns:
+            dict: Buffer counters, or None if write-behind is disabled
+        """
+        if self.write_buffer is None:
+            return None
+        return self.write_buffer.stats()
+
+    def cache_stats(self):
+        """
+        Read-through cache counters
+
+        Returns:
+            dict: Cache counters, or None if caching is disabled
+        """
+        if self.cache is None:
+            return None
+        return self.cache.stats()
 
     def list_keys(self, prefix=""):
         """
         List all keys in the bucket with given prefix
 
+        Prefer iter_keys or list_page for large prefixes; this materialises
+        the whole listing in memory.
+
         Args:
             prefix (str): Optional prefix to filter keys
 
         Returns:
             list: List of keys without .json extension
         """
+        prefixes = self.layout.list_prefixes(prefix)
+        if len(prefixes) == 1:
+            return list(self.iter_keys(prefix))
+
+        # Sharded collection: list every shard in parallel and merge
         keys = []
-        bucket = self.s3.Bucket(self.bucket_name)
+        for shard_keys in self._get_executor().map(
+                lambda physical: list(self._iter_physical(physical)), prefixes):
+            keys.extend(shard_keys)
+        if self.segments is not None:
+            keys.extend(self.segments.keys(prefix))
+        keys.sort()
+        return keys
+
+    def iter_keys(self, prefix="", start_after=None, page_size=1000):
+        """
+        Lazily yield keys with given prefix, one listing page at a time
+
+        Args:
+            prefix (str): Optional prefix to filter keys
+            start_after (str): Only yield keys that sort after this key
+            page_size (int): Keys requested per ListObjectsV2 call (max 1000)
+
+        Yields:
+            str: Keys without .json extension, in lexicographic order (per
+            shard when the prefix is inside a sharded collection)
+        """
+        keys = self._iter_stored_keys(prefix, start_after, page_size)
+        if self.segments is not None:
+            # Packed and standalone keys never overlap, so a plain merge suffices
+            keys = heapq.merge(keys, self.segments.keys(prefix, start_after))
+        yield from keys
+
+    def _iter_stored_keys(self, prefix="", start_after=None, page_size=1000):
+        """Yield keys of standalone record objects, ignoring packed segments"""
+        for physical in self.layout.list_prefixes(prefix):
+            yield from self._iter_physical(physical, start_after, page_size)
+
+    def _iter_physical(self, physical_prefix, start_after=None, page_size=1000):
+        """Yield record keys listed under one physical prefix"""
+        token = None
+        physical_start = self.layout.start_after(physical_prefix, start_after) if start_after else None
+        physical_start = f"{physical_start}.json" if physical_start else None
+
+        while True:
+            keys, _, token = self._list_page(physical_prefix, page_size, token, physical_start)
+            for key in keys:
+                if start_after is None or key > start_after:
+                    yield key
+            if token is None:
+                return
+
+    def list_page(self, prefix="", page_size=100, cursor=None, delimiter=None):
+        """
+        List a single page of keys for cursor-based pagination
+
+        Args:
+            prefix (str): Optional prefix to filter keys
+            page_size (int): Maximum number of keys and prefixes to return
+            cursor (str): Opaque cursor returned by a previous call
+            delimiter (str): Optional delimiter, e.g. "/", to group keys into
+                "directories" instead of walking every object below them
+
+        Returns:
+            dict: {"keys": [...], "prefixes": [...], "cursor": str or None};
+            cursor is None on the last page. In packed collections, records
+            written since the last compaction are listed before packed ones.
+        """
+        physical_prefixes = self.layout.list_prefixes(prefix)
+        shard, token, packed_after = _decode_cursor(cursor) if cursor else (0, None, None)
+
+        keys, prefixes = [], []
+        while shard < len(physical_prefixes):
+            remaining = page_size - len(keys) - len(prefixes)
+            page_keys, page_prefixes, token = self._list_page(
+                physical_prefixes[shard], remaining, token, delimiter=delimiter
+            )
+            keys.extend(page_keys)
+            prefixes.extend(page_prefixes)
+            if token is not None:
+                break
+            shard += 1
+            if len(keys) + len(prefixes) >= page_size:
+                break
+
+        more = shard < len(physical_prefixes)
+        if not more and self.segments is not None and len(keys) + len(prefixes) < page_size:
+            # Standalone objects exhausted: continue with packed records
+            for key in self.segments.keys(prefix, packed_after):
+                if len(keys) + len(prefixes) >= page_size:
+                    more = True
+                    break
+                packed_after = key
+                cut = key.find(delimiter, len(prefix)) if delimiter else -1
+                if cut == -1:
+                    keys.append(key)
+                elif key[:cut + len(delimiter)] not in prefixes:
+                    prefixes.append(key[:cut + len(delimiter)])
+        elif not more and self.segments is not None:
+            more = next(iter(self.segments.keys(prefix, packed_after)), None) is not None
+
+        return {
+            "keys": keys,
+            "prefixes": prefixes,
+            "cursor": _encode_cursor(shard, token, packed_after) if more else None
+        }
+
+    def _list_page(self, prefix, page_size, continuation_token=None, start_after=None, delimiter=None):
+        """
+        List one page of objects under a physical prefix
+
+        Returns:
+            tuple: (record keys, common prefixes, next continuation token or None)
+        """
+        object_keys, prefixes, token = self.backend.list(
+            prefix, page_size, continuation_token, start_after, delimiter
+        )
+
+        keys = [
+            self.layout.from_object_key(object_key[:-5])  # Remove .json extension
+            for object_key in object_keys
+            if object_key.endswith('.json')
+        ]
+        prefixes = [p for p in prefixes if not p.startswith(f"{SEGMENT_PREFIX}/")]
+        return keys, prefixes, token
+
+    def migrate_layout(self, source_layout, prefix=""):
+        """
+        Re-key objects written with another key layout into this one
+
+        Objects are copied to their new key (server-side on S3) and the
+        originals are removed with batched deletes. Objects already at the right key
+        are left alone, so the migration can be re-run after interruption.
+
+        Args:
+            source_layout: Layout the existing objects were written with
+            prefix (str): Optional physical prefix to restrict the migration
+
+        Returns:
+            dict: Number of objects scanned, moved and failed
+        """
+        scanned = moved = failed = 0
+        token = None
+
+        while True:
+            object_keys, _, token = self.backend.list(prefix, DELETE_BATCH_SIZE, token)
+
+            moves = {}
+            for object_key in object_keys:
+                if not object_key.endswith('.json'):
+                    continue
+                scanned += 1
+                target = self._object_key(source_layout.from_object_key(object_key[:-5]))
+                if target != object_key:
+                    moves[object_key] = target
+
+            if moves:
+                copied = self._run_many(self.backend.copy, list(moves.items()))
+                done = [source for source, result in copied.items() if result.ok]
+                failed += len(moves) - len(done)
+
+                if done:
+                    errors = self.backend.delete_many(done)
+                    failed += len(errors)
+                    moved += len(done) - len(errors)
+
+            if token is None:
+                break
+
+        if self.cache is not None:
+            self.cache.clear()
+        return {"scanned": scanned, "moved": moved, "failed": failed}
+
+    def _object_key(self, key):
+        """Physical object key for a record key"""
+        return f"{self.layout.to_object_key(key)}.json"
+
+
+def _encode_cursor(shard, token, packed_after=None):
+    """Wrap a listing position into an opaque, URL-safe cursor"""
+    state = {"s": shard, "t": token}
+    if packed_after is not None:
+        state["p"] = packed_after
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
 
-        for obj in bucket.objects.filter(Prefix=prefix):
-            if obj.key.endswith('.json'):
-                keys.append(obj.key[:-5])  # Remove .json extension
+def _decode_cursor(cursor):
+    """
+    Unwrap a cursor produced by _encode_cursor
 
-        return keys
\ No newline at end of file
+    Returns:
+        tuple: (shard position, S3 continuation token, last packed key listed)
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(state.get("s", 0)), state["t"], state.get("p")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid pagination cursor")
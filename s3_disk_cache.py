@@ -0,0 +1,352 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - sweeps are not serialized across processes
+    fcntl = None
+
+from s3_codecs import CODEC_METADATA_KEY, Codec, decode
+
+# Fraction of max_bytes a sweep trims the cache down to, so sweeps don't run back to back
+LOW_WATERMARK = 0.9
+
+# Temporary files older than this are leftovers of crashed writers
+STALE_TMP_SECONDS = 3600
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, ttl=300, codec=None):
+        """
+        Local disk cache for records loaded by S3Database, shared by all
+        worker processes on a host
+
+        Entries are immutable files addressed by record key and ETag, read
+        through mmap. A small pointer file per key names the ETag last seen
+        for it; its mtime records when that ETag was last confirmed against
+        S3. Files are written to a temporary name and renamed into place,
+        so concurrent processes never observe partial entries.
+
+        Least recently used entries (by file mtime) are evicted once the
+        cache grows past max_bytes. Each process triggers a sweep after
+        writing max_bytes / 20 bytes; sweeps are serialized with a lock file,
+        so the cache may briefly overshoot by that amount per process.
+
+        Args:
+            path (str): Cache directory (created if missing)
+            max_bytes (int): Size cap of all entries on disk
+            ttl (float): Seconds an entry is served without revalidation
+            codec (Codec): Encoding of cached records (default: JSON)
+        """
+        self.root = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.codec = codec or Codec()
+        os.makedirs(self.root, exist_ok=True)
+
+        self._sweep_every = max(max_bytes // 20, 1)
+        self._written = 0
+        self._sweeping = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.entries = None  # as of the last sweep
+        self.bytes = None
+
+    # Paths
+
+    def _pointer_path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _entry_path(self, pointer_path, etag):
+        return f"{pointer_path}.{hashlib.sha256(etag.encode()).hexdigest()[:16]}"
+
+    def _write_atomic(self, path, body):
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    # Cache interface
+
+    def get(self, key):
+        """
+        Look up a cached entry, fresh or stale
+
+        Returns:
+            tuple: (data, etag, size, is_fresh), or None if the key is not cached
+        """
+        pointer = self._pointer_path(key)
+        try:
+            with open(pointer, "rb") as f:
+                etag = f.read().decode()
+                validated_at = os.fstat(f.fileno()).st_mtime
+            path = self._entry_path(pointer, etag)
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header_end = mm.find(b"\n")
+                header = json.loads(mm[:header_end])
+                if header["key"] != key or header["etag"] != etag:
+                    raise ValueError("Cache entry doesn't match its pointer")
+                data = decode(mm[header_end + 1:], {CODEC_METADATA_KEY: header["format"]},
+                              header["content_encoding"])
+                size = len(mm) - header_end - 1
+        except (OSError, ValueError, KeyError):
+            self._record("misses")
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used for LRU eviction
+        except OSError:
+            pass
+        self._record("hits")
+        return data, etag, size, time.time() - validated_at < self.ttl
+
+    def put(self, key, data, etag):
+        """Store a record fetched with the given ETag and mark it validated now; never raises"""
+        pointer = self._pointer_path(key)
+        path = self._entry_path(pointer, etag)
+
+        try:
+            written = self._write_entry(path, key, data, etag)
+            # Entry first, so a pointer never names a missing entry unless it was evicted
+            self._write_atomic(pointer, etag.encode())
+        except Exception as e:
+            # The record was loaded fine; a cache that can't be written is only a miss later
+            print(f"Error writing disk cache entry for {key}: {str(e)}")
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._written += written
+            start_sweep = self._written >= self._sweep_every and not self._sweeping
+            if start_sweep:
+                self._written = 0
+                self._sweeping = True
+        if start_sweep:
+            threading.Thread(target=self.sweep, name="s3db-disk-cache-sweep", daemon=True).start()
+
+    def _write_entry(self, path, key, data, etag):
+        """Write an entry file unless it already exists; returns the bytes written"""
+        try:
+            os.utime(path)
+            return 0
+        except FileNotFoundError:
+            # Not cached yet, or a sweep evicted it just now
+            pass
+
+        body, put_args = self.codec.encode(data)
+        header = json.dumps({
+            "key": key,
+            "etag": etag,
+            "format": put_args["Metadata"][CODEC_METADATA_KEY],
+            "content_encoding": put_args.get("ContentEncoding")
+        }).encode()
+        self._write_atomic(path, header + b"\n" + body)
+        return len(header) + 1 + len(body)
+
+    def refresh(self, key):
+        """Mark the cached ETag of a key as confirmed after a successful revalidation"""
+        try:
+            os.utime(self._pointer_path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, key):
+        """Drop a single entry for every process on the host"""
+        pointer = self._pointer_path(key)
+        try:
+            with open(pointer, "rb") as f:
+                etag = f.read().decode()
+            os.remove(pointer)
+            os.remove(self._entry_path(pointer, etag))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Drop all entries"""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # Eviction
+
+    def sweep(self):
+        """
+        Evict least recently used entries until the cache fits in max_bytes
+
+        Skipped if another process is already sweeping.
+        """
+        try:
+            with open(os.path.join(self.root, ".lock"), "a") as lock:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return
+                self._sweep()
+        finally:
+            with self._lock:
+                self._sweeping = False
+
+    def _sweep(self):
+        now = time.time()
+        entries, total = [], 0
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith("."):
+                    if now - stat.st_mtime > STALE_TMP_SECONDS:
+                        _remove(entry.path)
+                    continue
+                if "." in entry.name:  # pointers are named by the bare key hash
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        evicted = 0
+        if total > self.max_bytes:
+            entries.sort()
+            target = self.max_bytes * LOW_WATERMARK
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                pointer = path.rpartition(".")[0]
+                _remove(path)
+                try:
+                    with open(pointer, "rb") as f:
+                        if self._entry_path(pointer, f.read().decode()) == path:
+                            _remove(pointer)
+                except OSError:
+                    pass
+                total -= size
+                evicted += 1
+
+        with self._lock:
+            self.evictions += evicted
+            self.entries = len(entries) - evicted
+            self.bytes = total
+
+    def stats(self):
+        """
+        Disk cache counters
+
+        Returns:
+            dict: hits, misses, writes, evictions, and entries and bytes as
+            of the last sweep (None before the first one)
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": self.entries,
+                "bytes": self.bytes,
+            }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class TieredCache:
+    def __init__(self, memory, disk):
+        """
+        Two-tier cache for S3Database: an in-process S3Cache in front of a
+        DiskCache shared by the processes on a host
+
+        Usable anywhere S3Database accepts an S3Cache. Memory misses fall
+        through to disk, so after a restart records come from local disk
+        instead of S3; disk entries another process confirmed within the
+        disk TTL are served without a request, older ones are revalidated
+        with a conditional GET as usual.
+
+        Args:
+            memory (S3Cache): First tier
+            disk (DiskCache): Second tier
+        """
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        """
+        Look up a cached entry, fresh or stale
+
+        Returns:
+            tuple: (data, etag, is_fresh), or None if the key is not cached
+        """
+        cached = self.memory.get(key)
+        if cached is not None and cached[2]:
+            return cached
+
+        from_disk = self.disk.get(key)
+        if from_disk is None:
+            return cached
+        data, etag, size, is_fresh = from_disk
+        if is_fresh:
+            self.memory.put(key, data, etag, size)
+            return data, etag, True
+        if cached is not None and cached[1] == etag:
+            return cached
+        # Another process cached a different version; drop ours so a 304 for
+        # the disk ETag can't extend the lifetime of the wrong body
+        self.memory.invalidate(key)
+        return data, etag, False
+
+    def put(self, key, data, etag, size):
+        """Store a record in both tiers; records without an ETag stay in memory"""
+        self.memory.put(key, data, etag, size)
+        if etag is not None:
+            self.disk.put(key, data, etag)
+
+    def record(self, counter):
+        """Increment one of the hits/misses/revalidations counters"""
+        self.memory.record(counter)
+
+    def refresh(self, key):
+        """Extend the lifetime of an entry after a successful revalidation"""
+        self.memory.refresh(key)
+        self.disk.refresh(key)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        self.memory.invalidate(key)
+        self.disk.invalidate(key)
+
+    def clear(self):
+        """Drop all entries"""
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self):
+        """
+        Cache counters
+
+        Returns:
+            dict: memory tier counters plus a "disk" dict of disk tier counters
+        """
+        return {**self.memory.stats(), "disk": self.disk.stats()}
@@ -0,0 +1,120 @@
+import hashlib
+
+
+class FlatLayout:
+    """Store every record at its own key, e.g. users/user123"""
+
+    def to_object_key(self, key):
+        """Physical object key (without extension) for a record key"""
+        return key
+
+    def from_object_key(self, object_key):
+        """Record key for a physical object key (without extension)"""
+        return object_key
+
+    def list_prefixes(self, prefix):
+        """
+        Physical prefixes to list for a record key prefix
+
+        Returns:
+            list: Prefixes whose listings, mapped through from_object_key,
+            together cover every record key starting with prefix
+        """
+        return [prefix]
+
+    def start_after(self, physical_prefix, key):
+        """
+        Physical StartAfter value for listing physical_prefix past a record key
+
+        Returns:
+            str: Object key (without extension), or None if listing order
+            doesn't follow record key order under this prefix
+        """
+        return key
+
+    def __repr__(self):
+        return "FlatLayout()"
+
+
+class HashShardLayout:
+    def __init__(self, collections, width=2):
+        """
+        Spread records of busy collections over hash-sharded prefixes
+
+        S3 scales request rate per key prefix, so a record key such as
+        users/user123 is stored as users/3f/user123 where "3f" is derived
+        from a hash of the record key. Sharded collections must hold flat
+        keys (no "/" after the collection name); other keys are unchanged.
+
+        Args:
+            collections (list): Collection names to shard, e.g. ["users"]
+            width (int): Hex digits per shard, giving 16 ** width shards
+        """
+        self.collections = set(collections)
+        self.width = width
+        self.shards = [f"{i:0{width}x}" for i in range(16 ** width)]
+        self._shard_set = frozenset(self.shards)
+
+    def shard(self, key):
+        """Shard identifier of a record key"""
+        return hashlib.md5(key.encode()).hexdigest()[:self.width]
+
+    def _split(self, key):
+        collection, sep, name = key.partition("/")
+        if sep and collection in self.collections and "/" not in name:
+            return collection, name
+        return None
+
+    def to_object_key(self, key):
+        """Physical object key (without extension) for a record key"""
+        split = self._split(key)
+        if split is None:
+            return key
+        collection, name = split
+        return f"{collection}/{self.shard(key)}/{name}"
+
+    def from_object_key(self, object_key):
+        """Record key for a physical object key (without extension)"""
+        parts = object_key.split("/")
+        if len(parts) == 3 and parts[0] in self.collections and parts[1] in self._shard_set:
+            return f"{parts[0]}/{parts[2]}"
+        return object_key
+
+    def list_prefixes(self, prefix):
+        """
+        Physical prefixes to list for a record key prefix
+
+        A prefix inside a sharded collection (users/ or users/us) fans out to
+        one prefix per shard; any other prefix is listed as-is, since sharded
+        objects still live below their collection name.
+        """
+        split = self._split(prefix)
+        if split is None:
+            return [prefix]
+        collection, name = split
+        return [f"{collection}/{shard}/{name}" for shard in self.shards]
+
+    def start_after(self, physical_prefix, key):
+        """
+        Physical StartAfter value for listing physical_prefix past a record key
+
+        Returns:
+            str: Object key (without extension), or None if listing order
+            doesn't follow record key order under this prefix
+        """
+        parts = physical_prefix.split("/")
+        if len(parts) == 3 and parts[0] in self.collections and parts[1] in self._shard_set:
+            # Fan-out prefix: records of one shard sort by name
+            split = self._split(key)
+            if split is None or split[0] != parts[0]:
+                return None
+            return f"{parts[0]}/{parts[1]}/{split[1]}"
+
+        covers_shards = any(
+            collection.startswith(physical_prefix) or physical_prefix.startswith(f"{collection}/")
+            for collection in self.collections
+        )
+        return None if covers_shards else key
+
+    def __repr__(self):
+        return f"HashShardLayout({sorted(self.collections)!r}, width={self.width})"
@@ -0,0 +1,311 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+# Histogram bucket upper bounds for call latency, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Error codes S3 returns when a prefix exceeds its request rate
+THROTTLE_CODES = frozenset(["SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded",
+                            "TooManyRequests", "503"])
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """Register a hook; hook.observe(...) is called once per storage call"""
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Unregister a hook added with add_hook"""
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def observe(operation, prefix, seconds, bytes_sent=0, bytes_received=0, retries=0, throttles=0, error=None):
+    """
+    Report one storage call to every registered hook
+
+    Args:
+        operation (str): API operation, e.g. "GetObject"
+        prefix (str): First segment of the object key, e.g. "users"
+        seconds (float): Wall time of the call including retries
+        bytes_sent (int): Request body size
+        bytes_received (int): Response body size
+        retries (int): Attempts beyond the first
+        throttles (int): Attempts rejected with a throttling error
+        error (str): Error code if the call failed, else None
+    """
+    for hook in list(_hooks):
+        try:
+            hook.observe(operation, prefix, seconds, bytes_sent, bytes_received, retries, throttles, error)
+        except Exception as e:
+            print(f"Error in metrics hook {hook!r}: {str(e)}")
+
+
+def key_prefix(key):
+    """Metric tag for an object key: its first path segment"""
+    if not key or "/" not in key:
+        return ""
+    return key.partition("/")[0]
+
+
+@contextmanager
+def timed(operation, key=""):
+    """Report the wall time of a block that makes no botocore request of its own"""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except ClientError as e:
+        error = e.response['Error']['Code']
+        raise
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        observe(operation, key_prefix(key), time.perf_counter() - start, error=error)
+
+
+# botocore instrumentation
+
+def instrument_client(client):
+    """
+    Report every API call made by a botocore S3 client
+
+    Hooks into the client's event system, so calls issued internally (e.g.
+    the parts of a managed upload_fileobj transfer) are covered too. Latency
+    is measured up to the response headers; streamed response bodies are
+    read by the caller afterwards.
+    """
+    events = client.meta.events
+    events.register('provide-client-params.s3', _before_call, unique_id='s3-metrics-before')
+    events.register('needs-retry.s3', _on_attempt, unique_id='s3-metrics-attempt')
+    events.register('after-call.s3', _after_call, unique_id='s3-metrics-after')
+    events.register('after-call-error.s3', _after_call_error, unique_id='s3-metrics-error')
+    return client
+
+
+def _params_key(params):
+    if 'Key' in params:
+        return params['Key']
+    if 'Prefix' in params:
+        return params['Prefix']
+    objects = params.get('Delete', {}).get('Objects')
+    return objects[0]['Key'] if objects else ""
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    if hasattr(body, '__len__'):
+        return len(body)
+    try:
+        position = body.tell()
+        size = body.seek(0, 2) - position
+        body.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def _before_call(params, model, context, **kwargs):
+    context['s3_metrics'] = {
+        'operation': model.name,
+        'start': time.perf_counter(),
+        'prefix': key_prefix(_params_key(params)),
+        'sent': _body_size(params.get('Body')),
+        'throttles': 0,
+    }
+
+
+def _on_attempt(response, request_dict, **kwargs):
+    state = request_dict.get('context', {}).get('s3_metrics')
+    if state is None or response is None:
+        return None
+    http_response, parsed = response
+    code = parsed.get('Error', {}).get('Code')
+    if code in THROTTLE_CODES or http_response.status_code in (429, 503):
+        state['throttles'] += 1
+    return None
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    state = context.pop('s3_metrics', None)
+    if state is None:
+        return
+
+    metadata = parsed.get('ResponseMetadata', {})
+    received = int(metadata.get('HTTPHeaders', {}).get('content-length') or 0)
+    error = None
+    if http_response.status_code >= 400:
+        error = parsed.get('Error', {}).get('Code') or str(http_response.status_code)
+
+    observe(model.name, state['prefix'], time.perf_counter() - state['start'],
+            bytes_sent=state['sent'], bytes_received=received,
+            retries=metadata.get('RetryAttempts', 0), throttles=state['throttles'], error=error)
+
+
+def _after_call_error(exception, context, **kwargs):
+    state = context.pop('s3_metrics', None)
+    if state is None:
+        return
+    # Connection-level failure after botocore gave up retrying
+    observe(state['operation'], state['prefix'], time.perf_counter() - state['start'],
+            bytes_sent=state['sent'], throttles=state['throttles'], error=type(exception).__name__)
+
+
+# Exporters
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum", "bytes_sent", "bytes_received", "retries", "throttles")
+
+    def __init__(self, bucket_count):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.throttles = 0
+
+
+class InMemoryMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Metrics hook aggregating calls per (operation, key prefix) in memory
+
+        Args:
+            buckets (tuple): Latency histogram bucket upper bounds in seconds
+        """
+        self.buckets = tuple(buckets)
+        self._series = {}  # (operation, prefix) -> _Series
+        self._errors = {}  # (operation, prefix, code) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, operation, prefix, seconds, bytes_sent=0, bytes_received=0, retries=0, throttles=0,
+                error=None):
+        with self._lock:
+            series = self._series.get((operation, prefix))
+            if series is None:
+                series = self._series[(operation, prefix)] = _Series(len(self.buckets))
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                series.buckets[index] += 1
+            series.count += 1
+            series.sum += seconds
+            series.bytes_sent += bytes_sent
+            series.bytes_received += bytes_received
+            series.retries += retries
+            series.throttles += throttles
+            if error is not None:
+                self._errors[(operation, prefix, error)] = self._errors.get((operation, prefix, error), 0) + 1
+
+    def snapshot(self):
+        """
+        Current values
+
+        Returns:
+            dict: "calls" maps (operation, prefix) to counters and cumulative
+            bucket counts; "errors" maps (operation, prefix, code) to a count
+        """
+        with self._lock:
+            calls = {}
+            for labels, series in self._series.items():
+                cumulative, running = [], 0
+                for count in series.buckets:
+                    running += count
+                    cumulative.append(running)
+                calls[labels] = {
+                    "count": series.count,
+                    "sum": series.sum,
+                    "buckets": dict(zip(self.buckets, cumulative)),
+                    "bytes_sent": series.bytes_sent,
+                    "bytes_received": series.bytes_received,
+                    "retries": series.retries,
+                    "throttles": series.throttles,
+                }
+            return {"calls": calls, "errors": dict(self._errors)}
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._series.clear()
+            self._errors.clear()
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+class PrometheusExporter:
+    def __init__(self, metrics, namespace="s3"):
+        """
+        Render InMemoryMetrics in the Prometheus text exposition format
+
+        Args:
+            metrics (InMemoryMetrics): Metrics to export
+            namespace (str): Metric name prefix
+        """
+        self.metrics = metrics
+        self.namespace = namespace
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in text format 0.0.4
+        """
+        snapshot = self.metrics.snapshot()
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_request_duration_seconds Latency of storage calls",
+            f"# TYPE {ns}_request_duration_seconds histogram",
+        ]
+        for (operation, prefix), values in sorted(snapshot["calls"].items()):
+            for bound, count in values["buckets"].items():
+                lines.append(f"{ns}_request_duration_seconds_bucket"
+                             f"{_labels(operation=operation, prefix=prefix, le=bound)} {count}")
+            lines.append(f"{ns}_request_duration_seconds_bucket"
+                         f"{_labels(operation=operation, prefix=prefix, le='+Inf')} {values['count']}")
+            lines.append(f"{ns}_request_duration_seconds_sum{_labels(operation=operation, prefix=prefix)} "
+                         f"{values['sum']}")
+            lines.append(f"{ns}_request_duration_seconds_count{_labels(operation=operation, prefix=prefix)} "
+                         f"{values['count']}")
+
+        counters = [
+            ("bytes_sent_total", "bytes_sent", "Request body bytes sent"),
+            ("bytes_received_total", "bytes_received", "Response body bytes received"),
+            ("retries_total", "retries", "Retried attempts"),
+            ("throttles_total", "throttles", "Attempts rejected with a throttling error"),
+        ]
+        for name, field, help_text in counters:
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} counter")
+            for (operation, prefix), values in sorted(snapshot["calls"].items()):
+                lines.append(f"{ns}_{name}{_labels(operation=operation, prefix=prefix)} {values[field]}")
+
+        lines.append(f"# HELP {ns}_errors_total Failed calls by error code")
+        lines.append(f"# TYPE {ns}_errors_total counter")
+        for (operation, prefix, code), count in sorted(snapshot["errors"].items()):
+            lines.append(f"{ns}_errors_total{_labels(operation=operation, prefix=prefix, code=code)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics, exported by the /metrics endpoint
+METRICS = InMemoryMetrics()
+add_hook(METRICS)
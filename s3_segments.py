@@ -0,0 +1,415 @@
+import gzip
+import json
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from urllib.parse import quote, unquote
+
+from s3_backends import NOT_MODIFIED
+from s3_codecs import CODEC_METADATA_KEY, decode
+
+# Segment objects, their indexes, manifests and tombstones live under this prefix
+SEGMENT_PREFIX = "_seg"
+
+
+class _Generation:
+    """In-memory view of one collection's manifest and merged segment index"""
+
+    def __init__(self, etag=None, segments=(), index=None):
+        self.etag = etag
+        self.segments = list(segments)
+        # name -> (segment id, offset, length, format, content encoding)
+        self.index = index or {}
+        self.sorted_names = sorted(self.index)
+        self.loaded_at = time.monotonic()
+
+
+class _CompactionGate:
+    """Lets writes to a collection run concurrently, but not while it is being compacted"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._writers = 0
+        self._compacting = False
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            while self._compacting:
+                self._condition.wait()
+            self._writers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writers -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def compact(self):
+        with self._condition:
+            while self._compacting:
+                self._condition.wait()
+            # Hold off new writes first so a steady stream of them can't starve compaction
+            self._compacting = True
+            while self._writers:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._compacting = False
+                self._condition.notify_all()
+
+
+class SegmentStore:
+    def __init__(self, collections, segment_bytes=8 * 1024 * 1024, refresh_interval=30,
+                 compact_interval=None):
+        """
+        Packed storage for collections of many small records
+
+        Compaction folds the standalone record objects of a collection into
+        large immutable segment objects, each with a compact offset index.
+        Reads check the standalone object first and fall back to a ranged
+        GET into the segment; a full scan reads a handful of segments
+        sequentially instead of issuing one GET per record.
+
+        Writes keep going to standalone objects. Overwriting a record that
+        lives in a segment, or deleting any packed record, also writes a
+        small tombstone, so the stale segment copy is ignored until the next
+        compaction drops it. Within a process, writes to a collection wait
+        while it is being compacted; across processes compaction assumes a
+        single compactor per collection.
+
+        Args:
+            collections (list): Collections to pack, e.g. ["users"]; records
+                must be flat keys directly below the collection name
+            segment_bytes (int): Target size of a segment object
+            refresh_interval (float): Seconds between manifest revalidations
+            compact_interval (float): If set, S3Database compacts every
+                collection in the background at this interval
+        """
+        self.collections = set(collections)
+        self.segment_bytes = segment_bytes
+        self.refresh_interval = refresh_interval
+        self.compact_interval = compact_interval
+        self.db = None
+
+        self._generations = {}  # collection -> _Generation
+        self._indexes = {}      # segment id -> index dict; segments are immutable
+        self._lock = threading.Lock()
+        self._gates = {collection: _CompactionGate() for collection in self.collections}
+
+    def attach(self, db):
+        """Bind the store to the S3Database whose backend and codec it uses"""
+        self.db = db
+
+    # Keys
+
+    def collection_of(self, key):
+        """Collection name if key is a record of a packed collection, else None"""
+        collection, sep, name = key.partition("/")
+        if sep and collection in self.collections and name and "/" not in name:
+            return collection
+        return None
+
+    def _manifest_key(self, collection):
+        return f"{SEGMENT_PREFIX}/{collection}/MANIFEST"
+
+    def _segment_key(self, collection, segment_id):
+        return f"{SEGMENT_PREFIX}/{collection}/segments/{segment_id}"
+
+    def _segment_index_key(self, collection, segment_id):
+        return f"{SEGMENT_PREFIX}/{collection}/segments/{segment_id}.idx"
+
+    def _tombstone_key(self, key):
+        collection, _, name = key.partition("/")
+        return f"{SEGMENT_PREFIX}/{collection}/tombstones/{quote(name, safe='')}"
+
+    # Manifest and index
+
+    def _generation(self, collection, force=False):
+        """Current generation of a collection, revalidating the manifest when due"""
+        with self._lock:
+            current = self._generations.get(collection)
+        if current is not None and not force and time.monotonic() - current.loaded_at < self.refresh_interval:
+            return current
+
+        backend = self.db.backend
+        obj = backend.get(self._manifest_key(collection), if_none_match=current.etag if current else None)
+        if obj is NOT_MODIFIED:
+            current.loaded_at = time.monotonic()
+            return current
+
+        if obj is None:
+            generation = _Generation()
+        else:
+            manifest = json.loads(obj.body)
+            index = {}
+            # Later segments win when a name appears more than once
+            for segment in manifest["segments"]:
+                for name, entry in self._segment_index(collection, segment).items():
+                    index[name] = entry
+            generation = _Generation(obj.etag, manifest["segments"], index)
+
+        with self._lock:
+            self._generations[collection] = generation
+        return generation
+
+    def _segment_index(self, collection, segment):
+        """Decoded offset index of an immutable segment"""
+        segment_id = segment["id"]
+        with self._lock:
+            cached = self._indexes.get(segment_id)
+        if cached is not None:
+            return cached
+
+        obj = self.db.backend.get(self._segment_index_key(collection, segment_id))
+        raw = json.loads(gzip.decompress(obj.body))
+        offsets = raw["offsets"]
+        index = {
+            name: (segment_id, offsets[i], offsets[i + 1] - offsets[i], raw["format"], raw["content_encoding"])
+            for i, name in enumerate(raw["names"])
+        }
+        with self._lock:
+            self._indexes[segment_id] = index
+        return index
+
+    def locate(self, key):
+        """Segment entry of a record key, or None if it isn't packed"""
+        collection = self.collection_of(key)
+        if collection is None:
+            return None
+        return self._generation(collection).index.get(key.partition("/")[2])
+
+    def _tombstones(self, collection):
+        """Names whose segment copies are dead"""
+        prefix = f"{SEGMENT_PREFIX}/{collection}/tombstones/"
+        names, token = set(), None
+        while True:
+            keys, _, token = self.db.backend.list(prefix, 1000, token)
+            names.update(unquote(key[len(prefix):]) for key in keys)
+            if token is None:
+                return names
+
+    # Hooks used by S3Database
+
+    @contextmanager
+    def writing(self, keys):
+        """Held around writes of keys, so they can't interleave with a compaction in this process"""
+        with ExitStack() as stack:
+            for collection in sorted({self.collection_of(key) for key in keys} - {None}):
+                stack.enter_context(self._gates[collection].write())
+            yield
+
+    def read(self, key):
+        """
+        Read a packed record with a ranged GET
+
+        Returns:
+            tuple: (data, size), or None if the record isn't in a live segment
+        """
+        collection = self.collection_of(key)
+        if collection is None:
+            return None
+
+        for attempt in range(2):
+            entry = self._generation(collection, force=attempt > 0).index.get(key.partition("/")[2])
+            if entry is None:
+                # Another process may have packed the record since the manifest was loaded
+                continue
+            segment_id, offset, length, format, content_encoding = entry
+
+            if self.db.backend.get(self._tombstone_key(key)) is not None:
+                return None
+            body = self.db.backend.get_range(self._segment_key(collection, segment_id), offset, length)
+            if body is not None:
+                return decode(body, {CODEC_METADATA_KEY: format}, content_encoding), length
+            # Segment was replaced by a concurrent compaction; reload the manifest and retry
+
+        return None
+
+    def record_written(self, key, deleted=False):
+        """
+        Mark the segment copy of a rewritten or deleted record as dead
+
+        Deletes always leave a tombstone, since a compaction running in
+        another process may still pack the record's last value. Rewrites
+        only need one if the record is packed, checked against a freshly
+        revalidated manifest; a segment copy published after that is
+        shadowed by the newer standalone object.
+        """
+        collection = self.collection_of(key)
+        if collection is None:
+            return
+        if deleted or key.partition("/")[2] in self._generation(collection, force=True).index:
+            self.db.backend.put(self._tombstone_key(key), b"")
+
+    def keys(self, prefix, start_after=None):
+        """
+        Sorted live packed keys starting with prefix
+
+        Only covers segment copies; standalone objects are listed separately
+        and never overlap with these, because a standalone copy of a packed
+        record always comes with a tombstone.
+        """
+        for collection in sorted(self.collections):
+            base = f"{collection}/"
+            if not (base.startswith(prefix) or prefix.startswith(base)):
+                continue
+
+            generation = self._generation(collection)
+            dead = self._tombstones(collection) if generation.index else set()
+            for name in generation.sorted_names:
+                key = base + name
+                if key.startswith(prefix) and name not in dead and (start_after is None or key > start_after):
+                    yield key
+
+    def items(self, prefix):
+        """Yield (key, data) for live packed records starting with prefix, segment by segment"""
+        for collection in sorted(self.collections):
+            base = f"{collection}/"
+            if not (base.startswith(prefix) or prefix.startswith(base)):
+                continue
+
+            generation = self._generation(collection, force=True)
+            if not generation.segments:
+                continue
+            dead = self._tombstones(collection)
+
+            for segment in generation.segments:
+                index = self._segment_index(collection, segment)
+                live = [
+                    (name, entry) for name, entry in index.items()
+                    # Skip dead copies and names superseded by a later segment
+                    if (base + name).startswith(prefix) and name not in dead
+                    and generation.index.get(name, (None,))[0] == segment["id"]
+                ]
+                if not live:
+                    continue
+                obj = self.db.backend.get(self._segment_key(collection, segment["id"]))
+                if obj is None:
+                    continue
+                for name, (_, offset, length, format, content_encoding) in live:
+                    body = obj.body[offset:offset + length]
+                    yield base + name, decode(body, {CODEC_METADATA_KEY: format}, content_encoding)
+
+    # Compaction
+
+    def compact(self, collection):
+        """
+        Fold standalone records and tombstones of a collection into new segments
+
+        Returns:
+            dict: Number of records packed, standalone objects folded,
+            tombstones dropped and segments written
+        """
+        if collection not in self.collections:
+            raise ValueError(f"Collection is not packed: {collection}")
+
+        with self._gates[collection].compact():
+            return self._compact(collection)
+
+    def _compact(self, collection):
+        db = self.db
+        backend = db.backend
+        generation = self._generation(collection, force=True)
+        dead = self._tombstones(collection)
+
+        # Standalone records, remembering the ETag they were folded at
+        standalone = {}
+        for key in list(db._iter_stored_keys(f"{collection}/")):
+            obj = backend.get(db._object_key(key))
+            if obj is not None:
+                data = decode(obj.body, obj.metadata, obj.content_encoding)
+                standalone[key.partition("/")[2]] = (data, obj.etag)
+
+        if not standalone and not dead:
+            return {"records": len(generation.index), "folded": 0, "tombstones": 0, "segments": 0}
+
+        format = db.codec.format
+        content_encoding = db.codec.compression
+
+        records = {}
+        for name, (data, _) in standalone.items():
+            records[name] = db.codec.encode(data)[0]
+        for segment in generation.segments:
+            index = self._segment_index(collection, segment)
+            live = [
+                (name, entry) for name, entry in index.items()
+                if name not in records and name not in dead and generation.index.get(name, (None,))[0] == segment["id"]
+            ]
+            if not live:
+                continue
+            body = backend.get(self._segment_key(collection, segment["id"])).body
+            for name, (_, offset, length, seg_format, seg_encoding) in live:
+                chunk = body[offset:offset + length]
+                if (seg_format, seg_encoding) != (format, content_encoding):
+                    chunk = db.codec.encode(decode(chunk, {CODEC_METADATA_KEY: seg_format}, seg_encoding))[0]
+                records[name] = chunk
+
+        # Standalone objects rewritten or deleted by another process since the
+        # snapshot: keep only the newer object, and don't resurrect deleted ones
+        for name, (_, etag) in standalone.items():
+            if backend.get(db._object_key(f"{collection}/{name}"), if_none_match=etag) is not NOT_MODIFIED:
+                del records[name]
+
+        segments = self._write_segments(collection, records, format, content_encoding)
+
+        manifest = {"segments": segments, "compacted_at": time.time()}
+        backend.put(self._manifest_key(collection), json.dumps(manifest).encode(), content_type="application/json")
+        self._generation(collection, force=True)
+
+        # Drop folded standalone objects unless they were rewritten meanwhile
+        folded = []
+        for name, (_, etag) in standalone.items():
+            key = f"{collection}/{name}"
+            if backend.get(db._object_key(key), if_none_match=etag) is NOT_MODIFIED:
+                folded.append(db._object_key(key))
+                if db.cache is not None:
+                    db.cache.invalidate(key)
+        tombstones = [self._tombstone_key(f"{collection}/{name}") for name in dead]
+        old_segments = [
+            key for segment in generation.segments
+            for key in (self._segment_key(collection, segment["id"]),
+                        self._segment_index_key(collection, segment["id"]))
+        ]
+        for batch_start in range(0, len(folded + tombstones + old_segments), 1000):
+            backend.delete_many((folded + tombstones + old_segments)[batch_start:batch_start + 1000])
+
+        return {
+            "records": len(records),
+            "folded": len(folded),
+            "tombstones": len(tombstones),
+            "segments": len(segments)
+        }
+
+    def _write_segments(self, collection, records, format, content_encoding):
+        """Write records (name -> encoded bytes) as segments of about segment_bytes"""
+        segments = []
+        names = sorted(records)
+        start = 0
+        while start < len(names):
+            body, offsets, end = bytearray(), [], start
+            while end < len(names) and (end == start or len(body) + len(records[names[end]]) <= self.segment_bytes):
+                offsets.append(len(body))
+                body += records[names[end]]
+                end += 1
+            offsets.append(len(body))
+
+            segment_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+            index = {
+                "format": format,
+                "content_encoding": content_encoding,
+                "names": names[start:end],
+                "offsets": offsets
+            }
+            # Index first, so a manifest never references a segment without one
+            self.db.backend.put(self._segment_index_key(collection, segment_id),
+                                gzip.compress(json.dumps(index).encode()))
+            self.db.backend.put(self._segment_key(collection, segment_id), bytes(body),
+                                content_type="application/octet-stream")
+            segments.append({"id": segment_id, "records": end - start, "bytes": len(body)})
+            start = end
+        return segments
@@ -0,0 +1,306 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .image_derivatives import RENDITION_FORMATS, RENDITIONS, rendition_key
+from .s3_service import S3_BUCKET_NAME, content_digest, file_key_from_url, get_s3_client, release_content
+
+# Local journal of pending deletions, shared by all workers on the host
+DELETE_QUEUE_PATH = os.environ.get('DELETE_QUEUE_PATH', 'delete-queue.sqlite3')
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+# Seconds between polls of the journal when nothing new was queued
+DELETE_POLL_INTERVAL = 5
+
+# Retry backoff: BASE * 2 ** attempts seconds with full jitter, capped at MAX
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 3600
+
+# Rows claimed by a worker are hidden from other workers for this long
+CLAIM_SECONDS = 300
+
+# Each row has its own id: two references to one content-addressed photo are
+# two releases, while plain object deletions of the same key coalesce
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS delete_journal (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS delete_journal_objects ON delete_journal (key) WHERE kind = 'object';
+CREATE INDEX IF NOT EXISTS delete_journal_due ON delete_journal (next_attempt);
+"""
+
+# Rows of the previous journal table, keyed by S3 key, are moved over on first use
+MIGRATE_PENDING_DELETES = """
+INSERT OR IGNORE INTO delete_journal (id, key, kind, attempts, next_attempt, enqueued_at, last_error)
+SELECT lower(hex(randomblob(16))), key, kind, attempts, next_attempt, enqueued_at, last_error
+FROM pending_deletes
+"""
+
+
+def photo_keys(file_key: str) -> List[str]:
+    """An original photo and all of its renditions"""
+    return [file_key] + [
+        rendition_key(file_key, name, format) for name in RENDITIONS for format in RENDITION_FORMATS
+    ]
+
+
+class DeleteQueue:
+    def __init__(self, path: str = DELETE_QUEUE_PATH):
+        """
+        Durable queue of S3 objects to delete, drained in the background
+
+        Deletions are written to a SQLite journal and acknowledged right
+        away; a worker removes them later with DeleteObjects batches and
+        retries failures with exponential backoff. Entries survive restarts,
+        so files left behind by failed requests are collected eventually.
+
+        Rows are either plain objects, or content-addressed photos whose
+        reference has to be released first (kind "content"). Every content
+        row releases one reference; its id is the release token, so a row
+        retried after a crash is not released twice.
+        """
+        self.path = path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._worker = None
+        self._wakeup = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(SCHEMA)
+                    self._migrate(connection)
+                    self._initialized = True
+        return connection
+
+    def _migrate(self, connection: sqlite3.Connection):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pending_deletes'"
+            ).fetchone():
+                connection.execute(MIGRATE_PENDING_DELETES)
+                connection.execute("DROP TABLE pending_deletes")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, keys: List[str], kind: str = "object", delay: float = 0):
+        """
+        Journal keys for deletion after delay seconds
+
+        Objects already queued keep their schedule; every content key is
+        journaled as a release of its own.
+
+        Args:
+            keys: S3 keys to delete
+            kind: "object" for a plain delete, "content" to release a content reference
+            delay: Seconds to wait before the first attempt
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.executemany(
+                "INSERT OR IGNORE INTO delete_journal (id, key, kind, next_attempt, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(uuid.uuid4().hex, key, kind, now + delay, now) for key in keys]
+            )
+        finally:
+            connection.close()
+
+    def enqueue_photo(self, file_url: str, delay: float = 0):
+        """Journal a stored photo and its renditions for deletion"""
+        file_key = file_key_from_url(file_url)
+        if content_digest(file_key) is not None:
+            # Renditions are shared too; they are queued once the last reference is gone
+            self.enqueue([file_key], kind="content", delay=delay)
+        else:
+            self.enqueue(photo_keys(file_key), delay=delay)
+
+    def cancel_photo(self, file_url: str):
+        """
+        Forget a queued photo deletion, e.g. once the upload was recorded after all
+
+        For a content-addressed photo only the latest pending release is
+        dropped; releases queued for its other references stay.
+        """
+        file_key = file_key_from_url(file_url)
+        connection = self._connect()
+        try:
+            if content_digest(file_key) is not None:
+                connection.execute(
+                    "DELETE FROM delete_journal WHERE id = (SELECT id FROM delete_journal "
+                    "WHERE key = ? AND kind = 'content' ORDER BY enqueued_at DESC LIMIT 1)",
+                    (file_key,)
+                )
+            else:
+                connection.executemany("DELETE FROM delete_journal WHERE key = ? AND kind = 'object'",
+                                       [(key,) for key in photo_keys(file_key)])
+        finally:
+            connection.close()
+
+    def _claim(self, limit: int) -> List[tuple]:
+        """Take due rows out of view of other workers for CLAIM_SECONDS"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT id, key, kind, attempts FROM delete_journal WHERE next_attempt <= ? "
+                "ORDER BY next_attempt LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            connection.executemany("UPDATE delete_journal SET next_attempt = ? WHERE id = ?",
+                                   [(now + CLAIM_SECONDS, row_id) for row_id, _, _, _ in rows])
+            connection.execute("COMMIT")
+            return rows
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _finish(self, done: List[str], failed: Dict[str, tuple]):
+        """Drop finished rows and reschedule failed ones; failed maps row id -> (attempts, error)"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("DELETE FROM delete_journal WHERE id = ?", [(row_id,) for row_id in done])
+            connection.executemany(
+                "UPDATE delete_journal SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                [
+                    (attempts + 1, now + random.uniform(0, min(RETRY_BASE_SECONDS * 2 ** attempts,
+                                                               RETRY_MAX_SECONDS)), error, row_id)
+                    for row_id, (attempts, error) in failed.items()
+                ]
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def drain_once(self, limit: int = DELETE_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Process one batch of due deletions
+
+        Returns:
+            dict: deleted and failed key counts
+        """
+        rows = self._claim(limit)
+        done, failed = [], {}
+        keys = {row_id: key for row_id, key, _, _ in rows}
+
+        objects = {key: (row_id, attempts) for row_id, key, kind, attempts in rows if kind == "object"}
+        for row_id, key, kind, attempts in rows:
+            if kind != "content":
+                continue
+            try:
+                # The row id is the release token, so a retry after a crash doesn't release twice
+                if release_content(key, row_id) == 0:
+                    self.enqueue(photo_keys(key)[1:])
+                done.append(row_id)
+            except Exception as e:
+                failed[row_id] = (attempts, str(e))
+
+        if objects:
+            try:
+                response = get_s3_client().delete_objects(
+                    Bucket=S3_BUCKET_NAME,
+                    Delete={'Objects': [{'Key': key} for key in objects], 'Quiet': True}
+                )
+                errors = {error['Key']: error.get('Code', 'Error') for error in response.get('Errors', [])}
+            except ClientError as e:
+                errors = {key: str(e) for key in objects}
+            for key, (row_id, attempts) in objects.items():
+                if key in errors:
+                    failed[row_id] = (attempts, errors[key])
+                else:
+                    done.append(row_id)
+
+        if done or failed:
+            self._finish(done, failed)
+        if failed:
+            row_id, (_, error) = next(iter(failed.items()))
+            print(f"Error deleting {len(failed)} files from S3 (e.g. {keys[row_id]}: {error}), will retry")
+        return {"deleted": len(done), "failed": len(failed)}
+
+    def pending(self) -> int:
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM delete_journal").fetchone()[0]
+        finally:
+            connection.close()
+
+    async def run(self, poll_interval: float = DELETE_POLL_INTERVAL):
+        """Drain the journal forever; new deletions wake the worker early"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                result = await asyncio.to_thread(self.drain_once)
+            except Exception as e:
+                print(f"Error draining delete queue: {str(e)}")
+                result = {"deleted": 0, "failed": 0}
+            # A full batch means more may be due right away
+            if result["deleted"] + result["failed"] >= DELETE_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def ensure_worker(self):
+        """Start the background worker on the running event loop if it isn't running yet"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._worker = loop.create_task(self.run())
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+
+DELETE_QUEUE = DeleteQueue()
+
+
+async def resume_pending_deletes():
+    """Start the worker on app startup if deletions from a previous run are still journaled"""
+    if await asyncio.to_thread(DELETE_QUEUE.pending) > 0:
+        DELETE_QUEUE.ensure_worker()
+
+
+async def schedule_photo_delete(file_url: Optional[str], delay: float = 0):
+    """
+    Queue a stored photo and its renditions for deletion in the background
+
+    Args:
+        file_url: URL of the photo (None is ignored)
+        delay: Seconds before the deletion may run, e.g. to give an upload
+            time to be completed before it counts as orphaned
+    """
+    if not file_url:
+        return
+    await asyncio.to_thread(DELETE_QUEUE.enqueue_photo, file_url, delay)
+    DELETE_QUEUE.ensure_worker()
+
+
+async def cancel_photo_delete(file_url: str):
+    """Keep a photo that was queued for deletion"""
+    await asyncio.to_thread(DELETE_QUEUE.cancel_photo, file_url)
@@ -0,0 +1,146 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - renditions are skipped without Pillow
+    Image = None
+
+from .s3_service import S3_BASE_URL, S3_BUCKET_NAME, file_key_from_url, get_s3_client
+
+# Rendition name -> bounding box; images are scaled down to fit, never up
+RENDITIONS = {
+    "thumb": (160, 160),
+    "small": (480, 480),
+    "medium": (1080, 1080),
+}
+
+# Output format -> (file extension, Pillow format, content type, save options)
+RENDITION_FORMATS = {
+    "webp": ("webp", "WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", "JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Worker processes decoding and resizing images
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def rendition_key(file_key: str, name: str, format: str) -> str:
+    """
+    Predictable S3 key of one rendition of an original, e.g.
+    activity-photos/7/<uuid>.jpg -> activity-photos/7/renditions/<uuid>/thumb.webp
+    """
+    folder, file_name = posixpath.split(file_key)
+    stem = posixpath.splitext(file_name)[0]
+    return posixpath.join(folder, "renditions", stem, f"{name}.{RENDITION_FORMATS[format][0]}")
+
+
+def rendition_urls(photo_url: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """
+    URLs of all renditions of a stored photo, by rendition name and format
+
+    Renditions are generated in the background after an upload, so clients
+    should fall back to the original URL while one is still missing.
+    """
+    if not photo_url:
+        return {}
+    file_key = file_key_from_url(photo_url)
+    return {
+        name: {format: f"{S3_BASE_URL}{rendition_key(file_key, name, format)}" for format in RENDITION_FORMATS}
+        for name in RENDITIONS
+    }
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared pool for image work, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that runs S3 transfer threads can deadlock
+                _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def render(body: bytes) -> Dict[tuple, bytes]:
+    """
+    Decode an image and encode every rendition (runs in a worker process)
+
+    Returns:
+        dict: (rendition name, format) -> encoded bytes
+    """
+    with Image.open(io.BytesIO(body)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    results = {}
+    for name, size in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for format, (_, pillow_format, _, options) in RENDITION_FORMATS.items():
+            if pillow_format == "JPEG" or not has_alpha:
+                frame = resized.convert("RGB")
+            else:
+                frame = resized.convert("RGBA")
+            output = io.BytesIO()
+            frame.save(output, pillow_format, **options)
+            results[(name, format)] = output.getvalue()
+    return results
+
+
+async def generate_renditions(file_key: str, public: bool = True) -> Dict[str, Dict[str, str]]:
+    """
+    Create and store all renditions of an uploaded photo
+
+    The original is downloaded from S3, decoded and resized on the process
+    pool, and the renditions are uploaded next to it. Meant to run as a
+    background task after the upload request has been answered.
+
+    Args:
+        file_key: S3 key of the original photo
+        public: Whether the renditions should be publicly accessible
+
+    Returns:
+        Rendition URLs by name and format, or an empty dict on failure
+    """
+    if Image is None:
+        print("Skipping image renditions: Pillow is not installed")
+        return {}
+
+    try:
+        client = get_s3_client()
+        response = await asyncio.to_thread(client.get_object, Bucket=S3_BUCKET_NAME, Key=file_key)
+        body = await asyncio.to_thread(response['Body'].read)
+
+        loop = asyncio.get_running_loop()
+        renditions = await loop.run_in_executor(get_process_pool(), render, body)
+
+        async def store(name, format, data):
+            extra_args = {"ACL": "public-read"} if public else {}
+            await asyncio.to_thread(
+                client.put_object,
+                Bucket=S3_BUCKET_NAME,
+                Key=rendition_key(file_key, name, format),
+                Body=data,
+                ContentType=RENDITION_FORMATS[format][2],
+                CacheControl="public, max-age=31536000, immutable",
+                **extra_args
+            )
+
+        await asyncio.gather(*(store(name, format, data) for (name, format), data in renditions.items()))
+    except Exception as e:
+        print(f"Error generating renditions for {file_key}: {str(e)}")
+        return {}
+
+    return rendition_urls(f"{S3_BASE_URL}{file_key}")
@@ -0,0 +1,208 @@
+import io
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Optional, Tuple
+
+# Signatures of the accepted image formats
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# Bytes looked at before giving up on finding the image dimensions;
+# JPEG EXIF, XMP and ICC segments come before the frame header
+MAX_HEADER_BYTES = 512 * 1024
+
+# JPEG start-of-frame markers (SOF0-SOF15 without DHT, JPG and DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class MediaValidationError(ValueError):
+    """An upload that breaks a limit; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class MediaLimits:
+    """What an endpoint accepts: size in bytes, width and height, total pixels"""
+    max_bytes: int
+    max_width: int = 8192
+    max_height: int = 8192
+    max_pixels: int = 40_000_000
+    allowed_types: Tuple[str, ...] = field(default=("image/jpeg", "image/png", "image/gif"))
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Image type from the first bytes of a file, or None if unrecognized"""
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def read_dimensions(head: bytes, content_type: str) -> Optional[Tuple[int, int]]:
+    """
+    Width and height from an image header without decoding it
+
+    Returns:
+        (width, height), or None if head ends before the dimensions
+
+    Raises:
+        MediaValidationError: if the header is malformed
+    """
+    if content_type == "image/png":
+        if len(head) < 24:
+            return None
+        if head[12:16] != b"IHDR":
+            raise MediaValidationError("Invalid PNG header")
+        return struct.unpack(">II", head[16:24])
+
+    if content_type == "image/gif":
+        if len(head) < 10:
+            return None
+        return struct.unpack("<HH", head[6:10])
+
+    # JPEG: walk the marker segments up to the first frame header
+    offset = 2
+    while True:
+        if offset >= len(head):
+            return None
+        if head[offset] != 0xFF:
+            raise MediaValidationError("Invalid JPEG header")
+        while offset < len(head) and head[offset] == 0xFF:
+            offset += 1
+        if offset >= len(head):
+            return None
+        marker = head[offset]
+        offset += 1
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD8, 0xD9, 0xDA):
+            raise MediaValidationError("Invalid JPEG header")
+        if offset + 2 > len(head):
+            return None
+        length = struct.unpack(">H", head[offset:offset + 2])[0]
+        if length < 2:
+            raise MediaValidationError("Invalid JPEG header")
+        if marker in JPEG_SOF_MARKERS:
+            if offset + 7 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[offset + 3:offset + 7])
+            return width, height
+        offset += length
+
+
+def check_header(head: bytes, limits: MediaLimits, complete: bool = False) -> Optional[str]:
+    """
+    Validate type and dimensions from the start of a file
+
+    Args:
+        head: First bytes of the file
+        limits: Limits to enforce
+        complete: head is the whole file, or all of the header there is
+
+    Returns:
+        Detected content type, or None if more bytes are needed
+    """
+    if len(head) < 8 and not complete:
+        return None
+    content_type = sniff_content_type(head)
+    if content_type not in limits.allowed_types:
+        raise MediaValidationError("File is not a supported image (only JPEG, PNG, and GIF are allowed)")
+
+    dimensions = read_dimensions(head, content_type)
+    if dimensions is None:
+        if complete or len(head) >= MAX_HEADER_BYTES:
+            raise MediaValidationError("Could not read image dimensions")
+        return None
+
+    width, height = dimensions
+    if not width or not height:
+        raise MediaValidationError("Image has no pixels")
+    if width > limits.max_width or height > limits.max_height or width * height > limits.max_pixels:
+        raise MediaValidationError(
+            f"Image is {width}x{height}, at most {limits.max_width}x{limits.max_height} "
+            f"and {limits.max_pixels} pixels are allowed",
+            status_code=413
+        )
+    return content_type
+
+
+class ValidatingReader(io.RawIOBase):
+    def __init__(self, file: BinaryIO, limits: MediaLimits):
+        """
+        File wrapper that enforces media limits while the file is read
+
+        The header is checked as soon as enough of it went through, and
+        reading past max_bytes fails, so an upload reading from this object
+        is aborted by the first bad chunk instead of after the whole file
+        was sent. For seekable files precheck() rejects most bad uploads
+        before any data leaves the host.
+        """
+        super().__init__()
+        self._file = file
+        self.limits = limits
+        self.content_type = None
+        self._head = b""
+        self._start = file.tell() if file.seekable() else 0
+        self._read = 0
+
+    def precheck(self) -> str:
+        """
+        Check size and header of a seekable file up front, leaving its position unchanged
+
+        Returns:
+            Detected content type
+        """
+        if not self._file.seekable():
+            raise MediaValidationError("Upload stream cannot be inspected")
+        self._file.seek(0, io.SEEK_END)
+        size = self._file.tell() - self._start
+        self._file.seek(self._start)
+        self._check_size(size)
+        head = self._file.read(min(size, MAX_HEADER_BYTES))
+        self._file.seek(self._start)
+        self.content_type = check_header(head, self.limits, complete=True)
+        return self.content_type
+
+    def _check_size(self, size: int):
+        if size > self.limits.max_bytes:
+            raise MediaValidationError(
+                f"File is larger than {self.limits.max_bytes // (1024 * 1024)} MB",
+                status_code=413
+            )
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        position = self._file.tell() if self._file.seekable() else self._read
+        data = self._file.read(size)
+        self._read = position + len(data)
+        self._check_size(self._read - self._start)
+
+        if self.content_type is None:
+            if position - self._start <= len(self._head):
+                self._head = self._head[:position - self._start] + data
+                self._head = self._head[:MAX_HEADER_BYTES]
+            self.content_type = check_header(self._head, self.limits, complete=not data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
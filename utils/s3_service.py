@@ -1,18 +1,189 @@
-import boto3
+import asyncio
+import hashlib
+import json
+import threading
+import time
 import uuid
-from typing import BinaryIO, Optional, Dict, Any
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Dict, Any, List
 from botocore.exceptions import ClientError
 from fastapi import HTTPException, status
 import os
 from urllib.parse import urlparse
 
+# Top-level modules, as s3_database imports them: a relative import would load
+# second copies with their own client registry and metrics
+from aws_clients import get_client
+from s3_metrics import instrument_client, timed
+
+from .media_validation import MediaLimits, MediaValidationError, ValidatingReader
+
 # AWS S3 configuration
 S3_BUCKET_NAME = "s3-bucket-name"  # Replace with your bucket name
 S3_REGION = "aws-region"  # e.g., "us-east-1"
 S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com/"
 
-# Initialize S3 client
-s3_client = boto3.client('s3', region_name=S3_REGION)
+# Upload transfers: files above the threshold are sent as parallel multipart chunks
+UPLOAD_MULTIPART_THRESHOLD = int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_MAX_CONCURRENCY = int(os.environ.get('UPLOAD_MAX_CONCURRENCY', 10))  # threads shared by all uploads
+UPLOAD_TIMEOUT = float(os.environ.get('UPLOAD_TIMEOUT', 300))  # seconds per file
+
+# Content-addressed uploads: objects keyed by the SHA-256 of their bytes and shared
+# by every upload of the same file, with a reference count per object
+CONTENT_ADDRESSED_UPLOADS = os.environ.get('CONTENT_ADDRESSED_UPLOADS', '0') == '1'
+CONTENT_PREFIX = "content"
+CONTENT_REFS_PREFIX = "content-refs"
+# A reference record stuck in the "collecting" state this long belongs to a crashed delete
+STALE_COLLECTING_SECONDS = 60
+# Tokens of recent releases kept on a reference record, so retried releases are recognized
+RELEASE_TOKENS_KEPT = 100
+
+# Presigned GET URLs are memoized and reused until this many seconds before they expire
+PRESIGNED_URL_CACHE_SIZE = int(os.environ.get('PRESIGNED_URL_CACHE_SIZE', 10000))
+PRESIGNED_URL_MIN_TTL = 300
+
+_s3_client = None
+_transfer_manager = None
+_transfer_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Shared S3 client, created on first use instead of at import time"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = instrument_client(get_client('s3', S3_REGION))
+    return _s3_client
+
+
+def get_transfer_manager():
+    """
+    Shared S3 transfer manager for uploads, created on first use
+
+    Its worker pool is bounded by UPLOAD_MAX_CONCURRENCY across all
+    concurrent uploads; further parts wait in its queue.
+    """
+    global _transfer_manager
+    if _transfer_manager is None:
+        from boto3.s3.transfer import TransferConfig, create_transfer_manager
+        with _transfer_lock:
+            if _transfer_manager is None:
+                config = TransferConfig(
+                    multipart_threshold=UPLOAD_MULTIPART_THRESHOLD,
+                    multipart_chunksize=UPLOAD_CHUNK_SIZE,
+                    max_concurrency=UPLOAD_MAX_CONCURRENCY
+                )
+                _transfer_manager = create_transfer_manager(get_s3_client(), config)
+    return _transfer_manager
+
+
+class _TransferDone:
+    """s3transfer subscriber resolving an asyncio future when a transfer finishes"""
+
+    def __init__(self, loop, waiter):
+        self.loop = loop
+        self.waiter = waiter
+
+    def on_done(self, future, **kwargs):
+        self.loop.call_soon_threadsafe(self._resolve, future)
+
+    def _resolve(self, future):
+        if self.waiter.done():
+            return
+        try:
+            self.waiter.set_result(future.result())
+        except BaseException as e:
+            self.waiter.set_exception(e)
+
+
+async def _transfer(file_content: BinaryIO, file_key: str, extra_args: Dict[str, Any], timeout: float):
+    """
+    Upload a file on the transfer manager's threads without blocking the event loop
+
+    Cancelling the awaiting task or hitting the timeout cancels the transfer;
+    s3transfer then aborts any multipart upload it started.
+    """
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+    transfer = get_transfer_manager().upload(
+        file_content,
+        S3_BUCKET_NAME,
+        file_key,
+        extra_args=extra_args,
+        subscribers=[_TransferDone(loop, waiter)]
+    )
+    try:
+        return await asyncio.wait_for(waiter, timeout)
+    except BaseException:
+        transfer.cancel()
+        raise
+
+
+class PresignedUrlCache:
+    def __init__(self, max_entries: int = PRESIGNED_URL_CACHE_SIZE, min_ttl: float = PRESIGNED_URL_MIN_TTL):
+        """
+        Bounded LRU of presigned GET URLs
+
+        Signing costs CPU on every call, and galleries sign dozens of keys
+        per page. A cached URL is reused until min_ttl seconds before it
+        expires, so callers always get at least min_ttl seconds of validity
+        and repeated page views return identical, browser-cacheable URLs.
+        """
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self._entries = OrderedDict()  # (key, expiration) -> (url, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sign(self, file_key: str, expiration: int = 3600) -> str:
+        """Presigned GET URL for a key, from the cache when still valid long enough"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((file_key, expiration))
+            if entry is not None and entry[1] - now > min(self.min_ttl, expiration / 2):
+                self._entries.move_to_end((file_key, expiration))
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        with timed("GeneratePresignedUrl", file_key):
+            url = get_s3_client().generate_presigned_url(
+                'get_object',
+                Params={
+                    'Bucket': S3_BUCKET_NAME,
+                    'Key': file_key
+                },
+                ExpiresIn=expiration
+            )
+
+        with self._lock:
+            self._entries[(file_key, expiration)] = (url, now + expiration)
+            self._entries.move_to_end((file_key, expiration))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+presigned_urls = PresignedUrlCache()
+
+
+def file_key_from_url(file_url: str) -> str:
+    """S3 key of a file URL as returned by upload_file_to_s3"""
+    if file_url.startswith(S3_BASE_URL):
+        return file_url[len(S3_BASE_URL):]
+    return urlparse(file_url).path.lstrip('/')
+
+
+def sign_file_url(file_url: Optional[str], expiration: int = 3600) -> Optional[str]:
+    """Memoized presigned GET URL for a stored file URL (None stays None)"""
+    if not file_url:
+        return None
+    return presigned_urls.sign(file_key_from_url(file_url), expiration)
 
 
 def generate_file_key(file_prefix: str, file_name: str) -> str:
@@ -27,17 +198,188 @@ def generate_file_key(file_prefix: str, file_name: str) -> str:
     return f"{file_prefix}/{unique_id}{file_extension}"
 
 
+def generate_content_key(digest: str, file_name: str) -> str:
+    """Key of a content-addressed file: its SHA-256 digest plus the original extension"""
+    _, file_extension = os.path.splitext(file_name)
+    return f"{CONTENT_PREFIX}/{digest[:2]}/{digest}{file_extension.lower()}"
+
+
+def content_digest(file_key: str) -> Optional[str]:
+    """Digest of a content-addressed file key, or None for other keys"""
+    if not file_key.startswith(f"{CONTENT_PREFIX}/"):
+        return None
+    return os.path.splitext(os.path.basename(file_key))[0]
+
+
+def _hash_file(file_content: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a seekable file from its current position, which is restored afterwards"""
+    start = file_content.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file_content.read(chunk_size), b""):
+        digest.update(chunk)
+    file_content.seek(start)
+    return digest.hexdigest()
+
+
+def _refs_key(digest: str) -> str:
+    return f"{CONTENT_REFS_PREFIX}/{digest}.json"
+
+
+def _read_refs(digest: str):
+    """Reference record of a content object and its ETag, or (None, None)"""
+    try:
+        response = get_s3_client().get_object(Bucket=S3_BUCKET_NAME, Key=_refs_key(digest))
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return None, None
+        raise
+    return json.loads(response['Body'].read()), response['ETag']
+
+
+def _write_refs(digest: str, record: Dict[str, Any], etag: Optional[str]) -> bool:
+    """
+    Compare-and-swap a reference record with a conditional PUT
+
+    Returns:
+        False if the record changed since it was read (etag None: since it was missing)
+    """
+    condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        get_s3_client().put_object(
+            Bucket=S3_BUCKET_NAME,
+            Key=_refs_key(digest),
+            Body=json.dumps(record).encode(),
+            ContentType="application/json",
+            **condition
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            return False
+        raise
+    return True
+
+
+def _is_collecting(record: Optional[Dict[str, Any]]) -> bool:
+    return (record is not None and record.get("state") == "collecting"
+            and time.time() - record.get("since", 0) < STALE_COLLECTING_SECONDS)
+
+
+def _acquire_content(digest: str) -> int:
+    """
+    Add a reference to a content object
+
+    Waits while a concurrent delete of the object finishes, so a new
+    upload never races with its removal.
+
+    Returns:
+        Number of references before this one
+    """
+    while True:
+        record, etag = _read_refs(digest)
+        if _is_collecting(record):
+            time.sleep(0.05)
+            continue
+        previous = record["count"] if record is not None and record.get("state") == "active" else 0
+        updated = {"count": previous + 1, "state": "active"}
+        if previous and record.get("released"):
+            updated["released"] = record["released"]
+        if _write_refs(digest, updated, etag):
+            return previous
+
+
+def _release_content(digest: str, file_key: str, token: Optional[str] = None) -> int:
+    """
+    Drop a reference to a content object, deleting it with the last one
+
+    The record is switched to "collecting" with a compare-and-swap before
+    the object is deleted, so a concurrent upload either re-references it
+    first (and the delete is abandoned) or waits until it's gone.
+
+    Args:
+        digest: Content digest of the object
+        file_key: S3 key of the object
+        token: Identifies this release; a release retried with a token
+            already recorded on the object is not applied twice
+
+    Returns:
+        Number of remaining references
+    """
+    while True:
+        record, etag = _read_refs(digest)
+        if record is None or record.get("state") != "active":
+            return 0
+        released = record.get("released", [])
+        if token is not None and token in released:
+            return record["count"]
+        count = record["count"] - 1
+        if count > 0:
+            updated = {"count": count, "state": "active"}
+            if token is not None:
+                updated["released"] = (released + [token])[-RELEASE_TOKENS_KEPT:]
+            if _write_refs(digest, updated, etag):
+                return count
+            continue
+        if _write_refs(digest, {"count": 0, "state": "collecting", "since": time.time()}, etag):
+            get_s3_client().delete_object(Bucket=S3_BUCKET_NAME, Key=file_key)
+            get_s3_client().delete_object(Bucket=S3_BUCKET_NAME, Key=_refs_key(digest))
+            return 0
+
+
+def release_content(file_key: str, token: Optional[str] = None) -> int:
+    """
+    Drop one reference to a content-addressed file, deleting it with the last one
+
+    Blocking; callers on the event loop should run it in a thread.
+
+    Args:
+        file_key: S3 key of the content-addressed file
+        token: Unique id of this release, so retrying it is safe
+
+    Returns:
+        Number of remaining references
+    """
+    digest = content_digest(file_key)
+    if digest is None:
+        raise ValueError(f"Not a content-addressed file: {file_key}")
+    return _release_content(digest, file_key, token)
+
+
+def _object_exists(file_key: str) -> bool:
+    try:
+        get_s3_client().head_object(Bucket=S3_BUCKET_NAME, Key=file_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+    return True
+
+
 async def upload_file_to_s3(
         file_content: BinaryIO,
         file_name: str,
         content_type: str,
         file_prefix: str = "uploads",
         public: bool = True,
-        metadata: Optional[Dict[str, str]] = None
+        metadata: Optional[Dict[str, str]] = None,
+        timeout: float = UPLOAD_TIMEOUT,
+        content_addressed: Optional[bool] = None,
+        limits: Optional[MediaLimits] = None
 ) -> Dict[str, Any]:
     """
     Upload a file to AWS S3 bucket
 
+    The transfer runs on a bounded thread pool, so the event loop keeps
+    serving other requests while the file is sent.
+
+    In content-addressed mode the file is keyed by its SHA-256 under
+    content/ instead of a fresh UUID under file_prefix. If the object is
+    already stored, the upload is skipped and only its reference count
+    grows; ACL and metadata stay those of the first upload.
+
+    With limits, the file's real type, size and dimensions are checked
+    before the transfer starts and again while it is read, so a bad file
+    fails fast and a multipart upload in progress is aborted.
+
     Args:
         file_content: File content as a file-like object
         file_name: Original file name
@@ -45,13 +387,32 @@ async def upload_file_to_s3(
         file_prefix: Folder prefix for the file in S3
         public: Whether the file should be publicly accessible
         metadata: Additional metadata for the file
+        timeout: Seconds before the upload is cancelled
+        content_addressed: Key the file by content hash (default:
+            CONTENT_ADDRESSED_UPLOADS)
+        limits: Media limits to enforce; the detected image type replaces
+            content_type
 
     Returns:
         Dictionary with file information
     """
+    if content_addressed is None:
+        content_addressed = CONTENT_ADDRESSED_UPLOADS
+
     try:
+        # Reject files that are not what they claim to be before sending anything
+        if limits is not None:
+            file_content = ValidatingReader(file_content, limits)
+            if file_content.seekable():
+                content_type = await asyncio.to_thread(file_content.precheck)
+
         # Generate a unique file key
-        file_key = generate_file_key(file_prefix, file_name)
+        digest = None
+        if content_addressed:
+            digest = await asyncio.to_thread(_hash_file, file_content)
+            file_key = generate_content_key(digest, file_name)
+        else:
+            file_key = generate_file_key(file_prefix, file_name)
 
         # Set extra args
         extra_args = {
@@ -66,13 +427,18 @@ async def upload_file_to_s3(
         if metadata:
             extra_args["Metadata"] = metadata
 
-        # Upload file to S3
-        s3_client.upload_fileobj(
-            file_content,
-            S3_BUCKET_NAME,
-            file_key,
-            ExtraArgs=extra_args
-        )
+        # Upload file to S3, unless identical content is already stored
+        deduplicated = False
+        if digest is not None:
+            previous = await asyncio.to_thread(_acquire_content, digest)
+            deduplicated = previous > 0 and await asyncio.to_thread(_object_exists, file_key)
+        if not deduplicated:
+            try:
+                await _transfer(file_content, file_key, extra_args, timeout)
+            except BaseException:
+                if digest is not None:
+                    await asyncio.to_thread(_release_content, digest, file_key)
+                raise
 
         # Generate the file URL
         file_url = f"{S3_BASE_URL}{file_key}"
@@ -81,9 +447,21 @@ async def upload_file_to_s3(
             "key": file_key,
             "url": file_url,
             "file_name": file_name,
-            "content_type": content_type
+            "content_type": content_type,
+            "digest": digest,
+            "deduplicated": deduplicated
         }
 
+    except MediaValidationError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e)
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Uploading file to S3 timed out after {timeout} seconds"
+        )
     except ClientError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -91,60 +469,322 @@ async def upload_file_to_s3(
         )
 
 
-async def delete_file_from_s3(file_url: str) -> bool:
+async def generate_presigned_url(file_key: str, expiration: int = 3600) -> str:
+    """
+    Generate a presigned URL for a file in S3
+
+    URLs are memoized per key and expiration, see PresignedUrlCache.
+
+    Args:
+        file_key: S3 key for the file
+        expiration: URL expiration in seconds (default: 1 hour)
+
+    Returns:
+        Presigned URL
+    """
+    try:
+        # Generate the presigned URL (signed locally, no request to S3)
+        return presigned_urls.sign(file_key, expiration)
+
+    except ClientError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating presigned URL: {str(e)}"
+        )
+
+
+async def generate_presigned_urls(file_keys: List[str], expiration: int = 3600) -> Dict[str, str]:
     """
-    Delete a file from AWS S3 bucket
+    Generate presigned URLs for many files in one call
 
     Args:
-        file_url: URL of the file to delete
+        file_keys: S3 keys of the files
+        expiration: URL expiration in seconds (default: 1 hour)
 
     Returns:
-        True if successful, False otherwise
+        Dictionary mapping each key to its presigned URL
     """
     try:
-        # Extract file key from URL
-        parsed_url = urlparse(file_url)
-        file_key = parsed_url.path.lstrip('/')
+        return {file_key: presigned_urls.sign(file_key, expiration) for file_key in dict.fromkeys(file_keys)}
 
-        # Delete the file
-        s3_client.delete_object(
+    except ClientError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating presigned URLs: {str(e)}"
+        )
+
+
+async def generate_presigned_post(
+        file_prefix: str,
+        file_name: str,
+        content_type: str,
+        max_size: int,
+        public: bool = True,
+        metadata: Optional[Dict[str, str]] = None,
+        expiration: int = 600
+) -> Dict[str, Any]:
+    """
+    Generate a presigned POST policy so a client can upload a file directly to S3
+
+    The policy pins the key, content type, ACL and metadata, and limits the
+    body to max_size bytes, so S3 rejects anything else.
+
+    Args:
+        file_prefix: Folder prefix for the file in S3
+        file_name: Original file name (only its extension is kept)
+        content_type: MIME type the upload must declare
+        max_size: Maximum file size in bytes
+        public: Whether the file should be publicly accessible
+        metadata: Metadata the upload must carry
+        expiration: Policy expiration in seconds (default: 10 minutes)
+
+    Returns:
+        Dictionary with the file key, its final URL, and the form url and
+        fields to POST
+    """
+    file_key = generate_file_key(file_prefix, file_name)
+
+    fields = {"Content-Type": content_type}
+    if public:
+        fields["acl"] = "public-read"
+    for name, value in (metadata or {}).items():
+        fields[f"x-amz-meta-{name}"] = value
+
+    conditions = [{name: value} for name, value in fields.items()]
+    conditions.append(["content-length-range", 1, max_size])
+
+    try:
+        with timed("GeneratePresignedPost", file_key):
+            post = get_s3_client().generate_presigned_post(
+                S3_BUCKET_NAME,
+                file_key,
+                Fields=fields,
+                Conditions=conditions,
+                ExpiresIn=expiration
+            )
+    except ClientError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating presigned POST: {str(e)}"
+        )
+
+    return {
+        "key": file_key,
+        "file_url": f"{S3_BASE_URL}{file_key}",
+        "upload_url": post["url"],
+        "fields": post["fields"],
+        "expires_in": expiration
+    }
+
+
+async def head_file_in_s3(file_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a stored file without downloading it
+
+    Args:
+        file_key: S3 key for the file
+
+    Returns:
+        Dictionary with content_type, size and metadata, or None if the
+        file doesn't exist
+    """
+    try:
+        response = await asyncio.to_thread(
+            get_s3_client().head_object,
             Bucket=S3_BUCKET_NAME,
             Key=file_key
         )
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error checking file in S3: {str(e)}"
+        )
 
-        return True
+    return {
+        "content_type": response.get("ContentType"),
+        "size": response.get("ContentLength"),
+        "metadata": response.get("Metadata") or {}
+    }
+
+
+async def create_multipart_upload(
+        file_prefix: str,
+        file_name: str,
+        content_type: str,
+        public: bool = True,
+        metadata: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Start a multipart upload whose parts are sent in separate requests
+
+    Args:
+        file_prefix: Folder prefix for the file in S3
+        file_name: Original file name
+        content_type: MIME type of the file
+        public: Whether the file should be publicly accessible
+        metadata: Additional metadata for the file
+
+    Returns:
+        Dictionary with key and upload_id
+    """
+    file_key = generate_file_key(file_prefix, file_name)
+    extra_args = {"ContentType": content_type}
+    if public:
+        extra_args["ACL"] = "public-read"
+    if metadata:
+        extra_args["Metadata"] = metadata
+
+    try:
+        response = await asyncio.to_thread(
+            get_s3_client().create_multipart_upload,
+            Bucket=S3_BUCKET_NAME,
+            Key=file_key,
+            **extra_args
+        )
+    except ClientError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error starting upload to S3: {str(e)}"
+        )
+
+    return {"key": file_key, "upload_id": response["UploadId"]}
 
+
+def _multipart_error(e: ClientError, action: str) -> HTTPException:
+    if e.response['Error']['Code'] == 'NoSuchUpload':
+        return HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload no longer exists"
+        )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Error {action}: {str(e)}"
+    )
+
+
+async def upload_part_to_s3(file_key: str, upload_id: str, part_number: int, body: bytes) -> str:
+    """
+    Store one part of a multipart upload; parts can arrive in any order and in parallel
+
+    Sending the same part number again replaces the part.
+
+    Returns:
+        ETag of the part
+    """
+    try:
+        response = await asyncio.to_thread(
+            get_s3_client().upload_part,
+            Bucket=S3_BUCKET_NAME,
+            Key=file_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
     except ClientError as e:
-        print(f"Error deleting file from S3: {str(e)}")
-        return False
+        raise _multipart_error(e, "uploading part to S3")
+    return response["ETag"]
 
 
-async def generate_presigned_url(file_key: str, expiration: int = 3600) -> str:
+def _list_parts(file_key: str, upload_id: str) -> List[Dict[str, Any]]:
+    parts = []
+    kwargs = {"Bucket": S3_BUCKET_NAME, "Key": file_key, "UploadId": upload_id}
+    while True:
+        response = get_s3_client().list_parts(**kwargs)
+        parts.extend(response.get("Parts", []))
+        if not response.get("IsTruncated"):
+            return parts
+        kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+
+async def list_uploaded_parts(file_key: str, upload_id: str) -> List[Dict[str, Any]]:
     """
-    Generate a presigned URL for a file in S3
+    Parts S3 has received for a multipart upload
+
+    Returns:
+        List of dictionaries with part_number, size and etag, by part number
+    """
+    try:
+        parts = await asyncio.to_thread(_list_parts, file_key, upload_id)
+    except ClientError as e:
+        raise _multipart_error(e, "listing upload parts in S3")
+    return [
+        {"part_number": part["PartNumber"], "size": part["Size"], "etag": part["ETag"]}
+        for part in sorted(parts, key=lambda part: part["PartNumber"])
+    ]
+
+
+async def complete_multipart_upload(file_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> str:
+    """
+    Assemble the parts of a multipart upload into the final file
 
     Args:
         file_key: S3 key for the file
-        expiration: URL expiration in seconds (default: 1 hour)
+        upload_id: Multipart upload id
+        parts: Parts as returned by list_uploaded_parts
 
     Returns:
-        Presigned URL
+        URL of the file
     """
     try:
-        # Generate the presigned URL
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': S3_BUCKET_NAME,
-                'Key': file_key
-            },
-            ExpiresIn=expiration
+        await asyncio.to_thread(
+            get_s3_client().complete_multipart_upload,
+            Bucket=S3_BUCKET_NAME,
+            Key=file_key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [{"PartNumber": part["part_number"], "ETag": part["etag"]} for part in parts]
+            }
+        )
+    except ClientError as e:
+        raise _multipart_error(e, "completing upload in S3")
+    return f"{S3_BASE_URL}{file_key}"
+
+
+async def abort_multipart_upload(file_key: str, upload_id: str) -> bool:
+    """
+    Discard a multipart upload and the parts stored so far
+
+    Returns:
+        True if successful (or already gone), False otherwise
+    """
+    try:
+        await asyncio.to_thread(
+            get_s3_client().abort_multipart_upload,
+            Bucket=S3_BUCKET_NAME,
+            Key=file_key,
+            UploadId=upload_id
         )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchUpload':
+            return True
+        print(f"Error aborting upload in S3: {str(e)}")
+        return False
+
 
-        return presigned_url
+async def read_file_head(file_key: str, length: int) -> bytes:
+    """
+    Download only the first bytes of a stored file
+
+    Args:
+        file_key: S3 key for the file
+        length: Number of bytes to read
 
+    Returns:
+        Up to length bytes from the start of the file
+    """
+    try:
+        response = await asyncio.to_thread(
+            get_s3_client().get_object,
+            Bucket=S3_BUCKET_NAME,
+            Key=file_key,
+            Range=f"bytes=0-{length - 1}"
+        )
+        return await asyncio.to_thread(response['Body'].read)
     except ClientError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating presigned URL: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Error reading file from S3: {str(e)}"
+        )
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
+from ..utils.image_derivatives import rendition_urls
+from ..utils.s3_service import sign_file_url
 from .enums import VenueType, VenueStatus
 
 
@@ -68,6 +70,19 @@ class VenuePhoto(VenuePhotoBase):
     id: int
     photo_url: str
     uploaded_at: datetime
+    # Resized copies by name ("thumb", "small", "medium") and format ("webp", "jpeg")
+    renditions: Dict[str, Dict[str, str]] = {}
+
+    # Presigned GET URL of the original, memoized so galleries don't re-sign every item
+    signed_url: Optional[str] = None
+
+    @validator("renditions", always=True)
+    def derive_renditions(cls, v, values):
+        return v or rendition_urls(values.get("photo_url"))
+
+    @validator("signed_url", always=True)
+    def derive_signed_url(cls, v, values):
+        return v or sign_file_url(values.get("photo_url"))
 
     class Config:
         orm_mode = True